@@ -0,0 +1,123 @@
+import argparse
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+# --------------- SYNTHETIC SALES DATA GENERATOR ---------------
+
+# Writes a pipe-delimited file with the same schema and data quality issues as data/sales_data.txt:
+# thousands separators in prices, commas in product names, zero quantities, empty CustomerID/Region,
+# TransactionIDs with a bad prefix and rows with the wrong number of fields
+
+HEADER = 'TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region'
+
+BASE_PRODUCTS = [
+    'Laptop', 'Mouse', 'Keyboard', 'Monitor', 'Webcam', 'Headphones',
+    'USB Cable', 'External Hard Drive', 'Wireless Mouse', 'Laptop Charger'
+]
+PRODUCT_VARIANTS = ['Premium', 'Wireless', 'LED', 'HD', 'Gaming', 'Mechanical', '1TB', '65W']
+BASE_REGIONS = ['North', 'South', 'East', 'West']
+
+# share of rows that get each data quality issue
+QUIRK_RATES = {
+    'comma_price': 0.08,
+    'comma_product': 0.15,
+    'zero_quantity': 0.02,
+    'empty_customer': 0.02,
+    'empty_region': 0.01,
+    'bad_transaction_id': 0.03,
+    'wrong_field_count': 0.01,
+}
+
+
+# function to build the product catalog used by the generator: (ProductID, base name, unit price range)
+def build_products(product_count, rng):
+    products = []
+    for idx in range(product_count):
+        name = BASE_PRODUCTS[idx % len(BASE_PRODUCTS)]
+        if idx >= len(BASE_PRODUCTS):
+            name = f"{name} {idx // len(BASE_PRODUCTS)}"
+        low = rng.randint(100, 60000)
+        products.append((f"P{101 + idx}", name, low, low + rng.randint(50, 25000)))
+    return products
+
+
+# function to build the region names - extra regions are numbered after the four base regions
+def build_regions(region_count):
+    regions = list(BASE_REGIONS[:region_count])
+    for idx in range(len(regions), region_count):
+        regions.append(f"Region{idx + 1}")
+    return regions
+
+
+# function to generate the data rows one at a time
+def iter_rows(rows, region_count=4, product_count=10, customer_count=25, days=30, start_date=date(2024, 12, 1), seed=42):
+    rng = random.Random(seed)
+    products = build_products(product_count, rng)
+    regions = build_regions(region_count)
+    dates = [(start_date + timedelta(days=offset)).isoformat() for offset in range(days)]
+
+    for idx in range(rows):
+        product_id, product_name, price_low, price_high = products[rng.randrange(product_count)]
+
+        transaction_id = f"T{idx + 1:03d}"
+        quantity = rng.randint(1, 10)
+        unit_price = rng.randint(price_low, price_high)
+        customer_id = f"C{rng.randrange(customer_count) + 1:03d}"
+        region = regions[rng.randrange(region_count)]
+        price_text = str(unit_price)
+
+        if rng.random() < QUIRK_RATES['comma_price'] and unit_price >= 1000:
+            price_text = f"{unit_price:,}"
+        if rng.random() < QUIRK_RATES['comma_product']:
+            product_name = f"{product_name},{rng.choice(PRODUCT_VARIANTS)}"
+        if rng.random() < QUIRK_RATES['zero_quantity']:
+            quantity = 0
+        if rng.random() < QUIRK_RATES['empty_customer']:
+            customer_id = ''
+        if rng.random() < QUIRK_RATES['empty_region']:
+            region = ''
+        if rng.random() < QUIRK_RATES['bad_transaction_id']:
+            transaction_id = f"X{rng.randint(1, 999)}"
+
+        fields = [transaction_id, rng.choice(dates), product_id, product_name, str(quantity), price_text, customer_id, region]
+
+        if rng.random() < QUIRK_RATES['wrong_field_count']:
+            # drop a field or add an extra one
+            if rng.random() < 0.5:
+                del fields[rng.randrange(len(fields))]
+            else:
+                fields.append('extra')
+
+        yield '|'.join(fields)
+
+
+# function to write a synthetic sales data file
+def generate_sales_file(output_file, rows, region_count=4, product_count=10, customer_count=25, days=30, seed=42):
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(output_path, 'w', encoding='utf-8', newline='\n', buffering=1024 * 1024) as f:
+        f.write(HEADER + '\n')
+        for row in iter_rows(rows, region_count, product_count, customer_count, days, seed=seed):
+            f.write(row + '\n')
+
+    return output_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic pipe-delimited sales data")
+    parser.add_argument('--rows', type=float, default=1e5, help="number of data rows (e.g. 1e5 to 1e8)")
+    parser.add_argument('--regions', type=int, default=4, help="number of distinct regions")
+    parser.add_argument('--products', type=int, default=10, help="number of distinct products")
+    parser.add_argument('--customers', type=int, default=25, help="number of distinct customers")
+    parser.add_argument('--days', type=int, default=30, help="number of distinct dates")
+    parser.add_argument('--seed', type=int, default=42, help="random seed, the same seed gives the same file")
+    parser.add_argument('--output', default='benchmarks/data/sales_data_synthetic.txt', help="output file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    path = generate_sales_file(args.output, int(args.rows), args.regions, args.products, args.customers, args.days, args.seed)
+    print(f"Wrote {int(args.rows)} rows to {path}")
@@ -0,0 +1,222 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# the benchmarks import the project modules - make the project folder importable when run as a script
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+from benchmarks.generate_sales_data import generate_sales_file, build_products
+from utils.file_handler import read_sales_data, parse_transactions, validate_and_filter
+from utils.data_processor import (
+    aggregate_transactions,
+    calculate_total_revenue,
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products
+)
+from utils.api_handler import create_product_mapping, enrich_sales_data, save_enriched_data
+from main import generate_sales_report
+
+RESULTS_DIR = PROJECT_DIR / 'benchmarks' / 'results'
+
+
+# --------------- BENCHMARK HELPERS ---------------
+
+# function to get the current git commit, so results can be compared across commits
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# function to time one call - returns (result, wall seconds, cpu seconds)
+# the pipeline functions print progress, their output is discarded
+def timed_call(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = func(*args, **kwargs)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+    return result, wall, cpu
+
+
+# function to measure the peak memory allocated by one call (tracemalloc slows the call, so it is a separate run)
+def peak_memory(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return peak
+
+
+# function to benchmark one stage - best wall/cpu time of `repeat` runs, then one traced run for peak memory
+def benchmark_stage(name, rows, func, *args, repeat=3, memory=True, **kwargs):
+    best_wall = best_cpu = None
+    result = None
+
+    for _ in range(repeat):
+        result, wall, cpu = timed_call(func, *args, **kwargs)
+        best_wall = wall if best_wall is None else min(best_wall, wall)
+        best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+
+    stats = {
+        'rows': rows,
+        'wall_seconds': round(best_wall, 6),
+        'cpu_seconds': round(best_cpu, 6),
+        'rows_per_second': round(rows / best_wall, 1) if best_wall > 0 else None,
+    }
+    if memory:
+        stats['peak_memory_bytes'] = peak_memory(func, *args, **kwargs)
+
+    print(f"{name:<45}{stats['wall_seconds']:>12.4f}s{stats.get('peak_memory_bytes', 0) / 1024 / 1024:>12.1f} MB")
+    return result, stats
+
+
+# --------------- BENCHMARK SUITE ---------------
+
+# function to run every pipeline stage on a generated file
+def run_suite(data_file, product_count, repeat=3, memory=True):
+    results = {}
+
+    def run(name, rows, func, *args, **kwargs):
+        result, results[name] = benchmark_stage(name, rows, func, *args, repeat=repeat, memory=memory, **kwargs)
+        return result
+
+    # data lines in the file (header excluded) - the input size of the first stage
+    with open(data_file, 'rb') as f:
+        line_count = max(0, sum(1 for _ in f) - 1)
+
+    raw_lines = run('read_sales_data', line_count, read_sales_data, str(data_file))
+    row_count = len(raw_lines)
+
+    transactions = run('parse_transactions', row_count, parse_transactions, raw_lines)
+    valid_txns, _, _ = run('validate_and_filter', len(transactions), validate_and_filter, transactions)
+
+    valid_count = len(valid_txns)
+    aggregates = run('aggregate_transactions', valid_count, aggregate_transactions, valid_txns)
+    run('calculate_total_revenue', valid_count, calculate_total_revenue, valid_txns)
+    run('region_wise_sales', valid_count, region_wise_sales, valid_txns)
+    run('top_selling_products', valid_count, top_selling_products, valid_txns, n=5)
+    run('customer_analysis', valid_count, customer_analysis, valid_txns)
+    run('daily_sales_trend', valid_count, daily_sales_trend, valid_txns)
+    run('find_peak_sales_day', valid_count, find_peak_sales_day, valid_txns)
+    run('low_performing_products', valid_count, low_performing_products, valid_txns)
+
+    # enrichment uses a synthetic catalog that covers about half of the products, no network calls are made
+    api_products = [
+        {'id': int(product_id[1:]), 'title': name, 'category': 'synthetic', 'brand': 'Bench', 'rating': 4.0}
+        for product_id, name, _, _ in build_products(product_count, random.Random(0))[::2]
+    ]
+    product_mapping = create_product_mapping(api_products)
+    enriched_txns = run('enrich_sales_data', valid_count, enrich_sales_data, valid_txns, product_mapping)
+
+    # written output goes to a temporary folder that is removed afterwards, even if a stage fails
+    with tempfile.TemporaryDirectory(prefix='sales_bench_') as work_dir:
+        work_dir = Path(work_dir)
+        run('save_enriched_data', valid_count, save_enriched_data, enriched_txns, filename=str(work_dir / 'enriched.txt'))
+
+        run('generate_sales_report', valid_count, generate_sales_report, valid_txns, enriched_txns, output_file=str(work_dir / 'report.txt'))
+        run('generate_sales_report (prebuilt aggregates)', valid_count, generate_sales_report, aggregates, enriched_txns, output_file=str(work_dir / 'report.txt'))
+
+    return results
+
+
+# function to print the change of each stage against an earlier results file
+def compare_results(baseline, current):
+    print(f"\n{'Stage':<45}{'Baseline':>12}{'Current':>12}{'Change':>10}")
+    for name, stats in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            print(f"{name:<45}{'-':>12}{stats['wall_seconds']:>11.4f}s{'new':>10}")
+            continue
+        change = (stats['wall_seconds'] / before['wall_seconds'] - 1) * 100 if before['wall_seconds'] else 0.0
+        print(f"{name:<45}{before['wall_seconds']:>11.4f}s{stats['wall_seconds']:>11.4f}s{change:>+9.1f}%")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sales analytics pipeline")
+    parser.add_argument('--rows', type=float, default=1e5, help="rows in the generated data file")
+    parser.add_argument('--regions', type=int, default=4)
+    parser.add_argument('--products', type=int, default=10)
+    parser.add_argument('--customers', type=int, default=25)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc peak memory runs")
+    parser.add_argument('--data-file', default=None, help="benchmark an existing file instead of generating one")
+    parser.add_argument('--output', default=None, help="results JSON file (default: benchmarks/results/<timestamp>_<commit>.json)")
+    parser.add_argument('--compare', default=None, help="earlier results JSON file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = int(args.rows)
+
+    if args.data_file:
+        data_file = Path(args.data_file).resolve()
+    else:
+        data_file = PROJECT_DIR / 'benchmarks' / 'data' / (
+            f"sales_{rows}_{args.regions}r_{args.products}p_{args.customers}c_{args.days}d_{args.seed}.txt"
+        )
+        if not data_file.exists():
+            print(f"Generating {rows} rows into {data_file}...")
+            generate_sales_file(data_file, rows, args.regions, args.products, args.customers, args.days, args.seed)
+
+    print(f"\n{'Stage':<45}{'Wall time':>13}{'Peak memory':>15}")
+    results = run_suite(data_file, args.products, repeat=args.repeat, memory=not args.no_memory)
+
+    commit = current_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'data_file': str(data_file),
+            'rows': rows,
+            'regions': args.regions,
+            'products': args.products,
+            'customers': args.customers,
+            'days': args.days,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}_{commit or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_results(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 from utils.file_handler import (
     read_sales_data, 
     parse_transactions, 
-    validate_and_filter
+    validate_and_filter,
+    iter_numbered_sales_data,
+    iter_checked_transactions,
+    iter_valid_transactions,
+    new_filter_summary,
+    new_reject_summary,
+    open_quarantine
 )
 from utils.data_processor import (
+    SalesAggregates,
+    aggregate_transactions,
+    aggregate_stream,
     calculate_total_revenue, 
     region_wise_sales, 
     top_selling_products, 
-    customer_analysis, 
+    top_customers,
     daily_sales_trend, 
     find_peak_sales_day, 
     low_performing_products
@@ -16,31 +25,61 @@ from utils.api_handler import (
     fetch_all_products,
     create_product_mapping,
     enrich_sales_data,
+    iter_enriched_sales_data,
+    summarize_enrichment,
     save_enriched_data
 )
 from pathlib import Path
 from datetime import datetime
-
+from concurrent.futures import ThreadPoolExecutor
+from utils.parallel import parallel_ingest
+from utils.shards import shard_ingest
+from utils.checkpoint import incremental_ingest
+from utils.parse_cache import load_parsed_table
+from utils.columnar import validate_and_filter as validate_and_filter_table, aggregate_table
+from utils.batch import load_scenarios, run_scenarios, scenario_filename
+from utils.profiler import PipelineProfiler, set_active_profiler
+from utils.server import AnalyticsStore, serve
+from utils.time_index import TimeIndex
+from utils.dedup import DEDUP_MODES, BLOOM_CAPACITY, open_seen_ids
+from utils.enriched_writer import PARTITION_FIELDS
+from utils.tail import SalesFileTailer
+from utils.money import paise_from_float, to_rupees, average_paise, format_paise
+import argparse
+import os
+import time
+
+# amounts are formatted from exact paise, so a rupee value is never shown off by a paisa
 def format_currency(value):
-    return f"₹{value:,.2f}"
+    return format_paise(paise_from_float(value))
 
 def divider(char='=', length=50):
     return char * length
 
-def generate_sales_report(transactions, enriched_transactions, output_file='output/sales_report.txt'):
+def generate_sales_report(transactions, enriched_transactions, output_file='output/sales_report.txt', quiet=False):
     base = Path(__file__).parent
     data_path = base / output_file
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # The report is written to a temporary file and moved into place, so readers never see a half-written report
+    temp_path = data_path.with_name(data_path.name + '.tmp')
+
+    # Builds every group-by in a single pass - all report sections read from these aggregates
+    # (transactions can also be an already built SalesAggregates object)
+    if isinstance(transactions, SalesAggregates):
+        aggregates = transactions
+    else:
+        aggregates = aggregate_transactions(transactions)
 
-    total_records = len(transactions)
-    total_revenue = calculate_total_revenue(transactions)
-    avg_order_value = total_revenue / total_records if total_records > 0 else 0.0
+    total_records = aggregates.record_count
+    total_revenue = calculate_total_revenue(aggregates)
+    avg_order_value = to_rupees(average_paise(aggregates.total_revenue_paise, total_records))
 
     # Date range
-    dates = [record['Date'] for record in transactions]
-    start_date = min(dates)
-    end_date = max(dates)
+    start_date = aggregates.min_date
+    end_date = aggregates.max_date
     
-    with open(data_path, 'w', encoding='utf-8') as f:
+    with open(temp_path, 'w', encoding='utf-8') as f:
         
         # =====================================================
         # 1. HEADER
@@ -60,7 +99,7 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
         f.write(f"Total Revenue: {format_currency(total_revenue)}\n")
         f.write(f"Total Transactions: {total_records}\n")
         f.write(f"Average Order Value: {format_currency(avg_order_value)}\n")
-        f.write(f"Date Range: {start_date} to {end_date}\n\n")
+        f.write(f"Date Range: {start_date} to {end_date}\n\n" if start_date else "Date Range: N/A\n\n")
 
 
         # =====================================================
@@ -69,7 +108,7 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
         f.write("REGION-WISE PERFORMANCE\n")
         f.write(divider('-') + "\n")
 
-        region_stats = region_wise_sales(transactions)
+        region_stats = region_wise_sales(aggregates)
 
         # Table header
         f.write(f"{'Region':<10}{'Sales':>15}{'% of Total':>15}{'Transactions':>15}\n")
@@ -91,7 +130,7 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
         f.write("TOP 5 PRODUCTS\n")
         f.write(divider('-') + "\n")
 
-        top_products = top_selling_products(transactions, n=5)
+        top_products = top_selling_products(aggregates, n=5)
 
         # Table header
         f.write(f"{'Rank':<6}{'Product Name':<20}{'Quantity Sold':>15}{'Revenue':>15}\n")
@@ -114,13 +153,13 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
         f.write("TOP 5 CUSTOMERS\n")
         f.write(divider('-') + "\n")
 
-        customer_stats = customer_analysis(transactions)
+        customer_stats = top_customers(aggregates, n=5)
 
         # Table header
         f.write(f"{'Rank':<6}{'Customer ID':<15}{'Total Spent':>20}{'Order Count':>15}\n")
         f.write(divider('-') + "\n")
 
-        for idx, (customer_id, stats) in enumerate(list(customer_stats.items())[:5], start=1):
+        for idx, (customer_id, stats) in enumerate(customer_stats.items(), start=1):
             total_spent = format_currency(stats['total_spent'])
             order_count = stats['purchase_count']
 
@@ -140,7 +179,7 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
         f.write("DAILY SALES TREND\n")
         f.write(divider('-') + "\n")
 
-        daily_trends = daily_sales_trend(transactions)
+        daily_trends = daily_sales_trend(aggregates)
 
         # Table header
         f.write(
@@ -163,29 +202,79 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
                 f"{unique_customers:>20}\n"
             )
 
+        if aggregates.distinct_precision is not None:
+            f.write(f"(Unique customers are HyperLogLog estimates, precision {aggregates.distinct_precision})\n")
+
         f.write("\n")
 
 
         # =====================================================
-        # 7. PRODUCT PERFORMANCE ANALYSIS
+        # 7. WEEKLY & MONTHLY TREND
+        # =====================================================
+        f.write("WEEKLY & MONTHLY TREND\n")
+        f.write(divider('-') + "\n")
+
+        # Prefix sums over the daily totals - every period total is a difference of two cumulative values
+        time_index = TimeIndex(aggregates)
+
+        for title, period in (('Week', 'week'), ('Month', 'month')):
+            # Table header
+            f.write(
+                f"{title:<12}"
+                f"{'Dates':<25}"
+                f"{'Revenue':>20}"
+                f"{'Transactions':>15}\n"
+            )
+            f.write(divider('-') + "\n")
+
+            for key, stats in time_index.rollup(period).items():
+                dates = f"{stats['start_date']} to {stats['end_date']}"
+                f.write(
+                    f"{key:<12}"
+                    f"{dates:<25}"
+                    f"{format_currency(stats['revenue']):>20}"
+                    f"{stats['transaction_count']:>15}\n"
+                )
+
+            f.write("\n")
+
+        # ---- Best 7-Day Window ----
+        rolling_week = time_index.rolling(7)
+        if rolling_week:
+            best_end, best_stats = max(rolling_week.items(), key=lambda item: item[1]['revenue'])
+            f.write(
+                f"Best 7-Day Window: ending {best_end} | "
+                f"Revenue: {format_currency(best_stats['revenue'])} | "
+                f"Transactions: {best_stats['transaction_count']}\n"
+            )
+
+        f.write("\n")
+
+
+        # =====================================================
+        # 8. PRODUCT PERFORMANCE ANALYSIS
         # =====================================================
         f.write("PRODUCT PERFORMANCE ANALYSIS\n")
         f.write(divider('-') + "\n")
 
         # ---- Best Selling Day ----
-        peak_date, peak_revenue, peak_txn_count = find_peak_sales_day(transactions)
-
         f.write("Peak Sales Day\n")
         f.write(divider('.') + "\n")
-        f.write(f"Date: {peak_date}\n")
-        f.write(f"Total Revenue: {format_currency(peak_revenue)}\n")
-        f.write(f"Transaction Count: {peak_txn_count}\n\n")
+
+        # no dates when nothing passed validation, e.g. a watched file truncated to its header
+        if not aggregates.dates:
+            f.write("No sales recorded.\n\n")
+        else:
+            peak_date, peak_revenue, peak_txn_count = find_peak_sales_day(aggregates)
+            f.write(f"Date: {peak_date}\n")
+            f.write(f"Total Revenue: {format_currency(peak_revenue)}\n")
+            f.write(f"Transaction Count: {peak_txn_count}\n\n")
 
         # ---- Low Performing Products ----
         f.write("Low Performing Products\n")
         f.write(divider('.') + "\n")
 
-        low_products = low_performing_products(transactions)
+        low_products = low_performing_products(aggregates)
 
         if not low_products:
             f.write("No low-performing products found.\n\n")
@@ -205,13 +294,14 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
         f.write("Average Transaction Value by Region\n")
         f.write(divider('.') + "\n")
 
-        region_stats = region_wise_sales(transactions)
+        region_stats = region_wise_sales(aggregates)
 
         f.write(f"{'Region':<15}{'Avg Transaction Value':>25}\n")
         f.write(divider('.') + "\n")
 
         for region, stats in region_stats.items():
-            avg_value = stats['total_sales'] / stats['transaction_count']
+            region_paise, region_count = aggregates.regions[region]
+            avg_value = to_rupees(average_paise(region_paise, region_count))
             f.write(
                 f"{region:<15}"
                 f"{format_currency(avg_value):>25}\n"
@@ -221,13 +311,19 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
 
 
         # =====================================================
-        # 8. API ENRICHMENT SUMMARY
+        # 9. API ENRICHMENT SUMMARY
         # =====================================================
         f.write("API ENRICHMENT SUMMARY\n")
         f.write(divider('-') + "\n")
 
-        total_enriched = len(enriched_transactions)
-        matched = sum(1 for txn in enriched_transactions if txn.get('API_Match'))
+        # enriched_transactions can be the enriched list or an already computed enrichment summary
+        if isinstance(enriched_transactions, dict):
+            enrichment = enriched_transactions
+        else:
+            enrichment = summarize_enrichment(enriched_transactions)
+
+        total_enriched = enrichment['total']
+        matched = enrichment['matched']
         not_matched = total_enriched - matched
         match_percentage = (matched / total_enriched * 100) if total_enriched > 0 else 0.0
 
@@ -236,93 +332,583 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
         f.write(f"API Matches Not Found: {not_matched}\n")
         f.write(f"Success Rate Percentage: {match_percentage:.2f}%\n\n")
 
+    os.replace(temp_path, data_path)
+
+    if not quiet:
+        print(f"Sales report generated at {data_path}")
+
+# Starts fetching the product catalog on a background thread
+# The fetch does not depend on the sales file, so the network round trip overlaps with reading, parsing and validating
+# Status messages are collected and printed when the catalog is needed, so they don't interrupt the prompts
+def start_catalog_fetch(enabled=True):
+    if not enabled:
+        return None
+
+    messages = []
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(fetch_all_products, log=messages.append)
+    executor.shutdown(wait=False)
+    return future, messages
+
+
+# Waits for the catalog fetch started by start_catalog_fetch (or fetches it now if none was started)
+def wait_for_catalog(catalog_fetch):
+    if catalog_fetch is None:
+        return fetch_all_products()
+
+    future, messages = catalog_fetch
+    api_products = future.result()
+    for message in messages:
+        print(message)
+    return api_products
+
+
+# Streaming mode: read, parse, validate, enrich, aggregate and save are chained generators
+# Only the aggregates are kept in memory, so peak memory does not grow with the number of rows
+def run_streaming_pipeline(filename='sales_data.txt', region=None, min_amount=None, max_amount=None, distinct_precision=None,
+                           quarantine_file='data/rejected_rows.txt', dedup=None, dedup_capacity=BLOOM_CAPACITY, output_options=None,
+                           max_groups=None):
+    print(divider())
+    print("SALES ANALYTICS SYSTEM (streaming mode)")
+    print(divider())
+
+    # Catalog is fetched first so enrichment can run inside the stream
+    print("\nFetching product data from API...")
+    api_products = fetch_all_products()
+    product_mapping = create_product_mapping(api_products)
+    print(f"✓ Fetched {len(api_products)} products")
+
+    print("\nStreaming sales data through the pipeline...")
+    filter_summary = new_filter_summary()
+    reject_summary = new_reject_summary()
+    enrichment = {'total': 0, 'matched': 0}
+    aggregates = SalesAggregates(distinct_precision, max_groups)
+
+    # Parsing and validation are one stage - rejected rows go to the quarantine file with their line number and reason
+    with open_quarantine(quarantine_file) as quarantine, open_seen_ids(dedup, dedup_capacity) as seen_ids:
+        numbered_lines = iter_numbered_sales_data(filename)
+        checked_txns = iter_checked_transactions(numbered_lines, filter_summary, reject_summary, quarantine)
+        valid_txns = iter_valid_transactions(checked_txns, region, min_amount, max_amount, filter_summary,
+                                             validated=True, seen_ids=seen_ids)
+        aggregated_txns = aggregate_stream(valid_txns, aggregates)
+        enriched_txns = iter_enriched_sales_data(aggregated_txns, product_mapping, enrichment)
+
+        # Saving consumes the stream - every stage above runs row by row as the file is written
+        saved_path = save_enriched_data(enriched_txns, **(output_options or {}))
+
+    print(f"✓ Valid: {filter_summary['final_count']} | Invalid: {filter_summary['invalid']}")
+    if dedup is not None:
+        print(f"✓ Duplicate TransactionIDs dropped: {filter_summary['duplicates']}")
+    rejected = sum(reject_summary.values())
+    if rejected:
+        reasons = ', '.join(f"{reason}: {count}" for reason, count in reject_summary.items() if count)
+        print(f"✓ Rejected {rejected} rows ({reasons}) - saved to {quarantine_file}")
+    print(f"✓ Enriched {enrichment['matched']}/{enrichment['total']} transactions")
+    print(f"✓ Saved to {saved_path}")
+
+    generate_sales_report(aggregates, enrichment)
+    print("✓ Report saved to output/sales_report.txt")
+    print(divider())
+
+    return aggregates, filter_summary
+
+
+# Parallel mode: the file is split into line-aligned byte ranges that are parsed, validated and aggregated on several cores
+def run_parallel_pipeline(filename='sales_data.txt', workers=None, region=None, min_amount=None, max_amount=None, prefetch=True,
+                          output_options=None):
+    print(divider())
+    print("SALES ANALYTICS SYSTEM (parallel mode)")
+    print(divider())
+
+    catalog_fetch = start_catalog_fetch(prefetch)
+
+    print("\nReading, parsing and validating sales data in parallel...")
+    valid_txns, invalid_count, filter_summary, aggregates = parallel_ingest(
+        filename,
+        workers=workers,
+        region=region,
+        min_amount=min_amount,
+        max_amount=max_amount
+    )
+    print(f"✓ Valid: {len(valid_txns)} | Invalid: {invalid_count}")
+
+    print("\nFetching product data from API...")
+    api_products = wait_for_catalog(catalog_fetch)
+    product_mapping = create_product_mapping(api_products)
+    print(f"✓ Fetched {len(api_products)} products")
+
+    enriched_txns = enrich_sales_data(valid_txns, product_mapping)
+    saved_path = save_enriched_data(enriched_txns, **(output_options or {}))
+    print(f"✓ Saved to {saved_path}")
+
+    generate_sales_report(aggregates, enriched_txns)
+    print("✓ Report saved to output/sales_report.txt")
+    print(divider())
+
+    return aggregates, filter_summary
+
+
+# Shard mode: every file matched by a directory or glob pattern is processed in a process pool
+# and the partial aggregates are merged into one report - the enriched rows are counted, not saved
+def run_shard_pipeline(pattern, workers=None, region=None, min_amount=None, max_amount=None, prefetch=True, distinct_precision=None):
+    print(divider())
+    print("SALES ANALYTICS SYSTEM (shard mode)")
+    print(divider())
+
+    # the workers enrich their rows, so the catalog is needed before the shards are handed out
+    catalog_fetch = start_catalog_fetch(prefetch)
+
+    print("\nFetching product data from API...")
+    api_products = wait_for_catalog(catalog_fetch)
+    product_mapping = create_product_mapping(api_products)
+    print(f"✓ Fetched {len(api_products)} products")
+
+    print(f"\nProcessing sales shards matching {pattern}...")
+    filter_summary, aggregates, enrichment, shard_files = shard_ingest(
+        pattern,
+        workers=workers,
+        region=region,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        product_mapping=product_mapping,
+        distinct_precision=distinct_precision
+    )
+    print(f"✓ Shards: {len(shard_files)} | Valid: {filter_summary['final_count']} | Invalid: {filter_summary['invalid']}")
+    print(f"✓ Enriched {enrichment['matched']}/{enrichment['total']} transactions")
+
+    if shard_files:
+        generate_sales_report(aggregates, enrichment)
+        print("✓ Report saved to output/sales_report.txt")
+    print(divider())
+
+    return aggregates, filter_summary
+
+
+# Incremental mode: only lines appended since the last run are parsed, the rest comes from the saved checkpoint
+def run_incremental_pipeline(filename='sales_data.txt', region=None, min_amount=None, max_amount=None, prefetch=True,
+                             output_options=None):
+    print(divider())
+    print("SALES ANALYTICS SYSTEM (incremental mode)")
+    print(divider())
+
+    catalog_fetch = start_catalog_fetch(prefetch)
 
-    print(f"Sales report generated at {data_path}")
+    # new rows are enriched once, their match counts are kept in the checkpoint with the aggregates
+    # the catalog is only waited for here, after the new lines have been parsed
+    enriched_txns = []
+
+    def enrich_new_rows(state, new_transactions):
+        print("\nFetching product data from API...")
+        api_products = wait_for_catalog(catalog_fetch)
+        product_mapping = create_product_mapping(api_products)
+        print(f"✓ Fetched {len(api_products)} products")
+
+        enrichment = state.get('enrichment', {'total': 0, 'matched': 0})
+        enriched_txns.extend(iter_enriched_sales_data(new_transactions, product_mapping, enrichment))
+        return {'enrichment': enrichment}
+
+    print("\nProcessing new sales data...")
+    aggregates, filter_summary, new_txns, state, rebuild = incremental_ingest(
+        filename,
+        region=region,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        update_state=enrich_new_rows
+    )
+    if rebuild:
+        print(f"✓ Full rebuild: {len(new_txns)} valid transactions")
+    else:
+        print(f"✓ Merged {len(new_txns)} new valid transactions into the checkpoint")
+
+    saved_path = save_enriched_data(enriched_txns, append=not rebuild, **(output_options or {}))
+    print(f"✓ Saved to {saved_path}")
+
+    generate_sales_report(aggregates, state['enrichment'])
+    print("✓ Report saved to output/sales_report.txt")
+    print(divider())
+
+    return aggregates, filter_summary
+
+
+# Batch mode: every filter scenario in the scenario file is evaluated against one read of the sales file
+# and gets its own report, no prompts are shown
+def run_batch_pipeline(scenario_file, filename='sales_data.txt', output_dir='output/scenarios', prefetch=True):
+    print(divider())
+    print("SALES ANALYTICS SYSTEM (batch mode)")
+    print(divider())
+
+    catalog_fetch = start_catalog_fetch(prefetch)
+    scenarios = load_scenarios(scenario_file)
+    print(f"\n✓ Loaded {len(scenarios)} scenarios from {scenario_file}")
+
+    print("\nFetching product data from API...")
+    api_products = wait_for_catalog(catalog_fetch)
+    product_mapping = create_product_mapping(api_products)
+    print(f"✓ Fetched {len(api_products)} products")
+
+    print("\nEvaluating all scenarios in a single pass...")
+    results = run_scenarios(filename, scenarios, product_mapping)
+
+    for result in results:
+        name = result['scenario']['name']
+        summary = result['filter_summary']
+        print(f"\n[{name}] Valid: {summary['final_count']} | Invalid: {summary['invalid']} | "
+              f"Filtered by region: {summary['filtered_by_region']} | Filtered by amount: {summary['filtered_by_amount']}")
+
+        if result['aggregates'].record_count == 0:
+            print(f"✗ No transactions match scenario {name} - report skipped")
+            continue
+
+        report_file = f"{output_dir}/{scenario_filename(name)}.txt"
+        generate_sales_report(result['aggregates'], result['enrichment'], output_file=report_file)
+
+    print(divider())
+    return results
+
+
+# Server mode: the file is loaded, validated, enriched and indexed once, then analyses are answered over HTTP
+# Lines appended to the file are picked up on the next request
+def run_server(filename='sales_data.txt', host='127.0.0.1', port=8765, prefetch=True, profiler=None):
+    print(divider())
+    print("SALES ANALYTICS SYSTEM (server mode)")
+    print(divider())
+
+    catalog_fetch = start_catalog_fetch(prefetch)
+
+    print("\nFetching product data from API...")
+    api_products = wait_for_catalog(catalog_fetch)
+    product_mapping = create_product_mapping(api_products)
+    print(f"✓ Fetched {len(api_products)} products")
+
+    print("\nLoading and indexing sales data...")
+    store = AnalyticsStore(filename, product_mapping)
+    status = store.status()
+    if status['error']:
+        print(f"✗ Could not load sales data ({status['error']}) - queries return 503 until it can be read")
+    else:
+        print(f"✓ Valid: {status['valid_transactions']} | Invalid: {status['invalid_transactions']}")
+
+    # queries are not recorded as profiler stages - a long-running server would grow the profile without bound
+    set_active_profiler(None)
+    if profiler is not None:
+        profiler.stop()
+
+    serve(store, host, port)
+    print(divider())
+
+
+# Watch mode: the sales file is tailed and the report is re-rendered from the running aggregates
+# Each poll parses only the appended lines; rendering reads the aggregates, so neither step grows with the history
+def run_watch_pipeline(filename='sales_data.txt', region=None, min_amount=None, max_amount=None, prefetch=True,
+                       poll_interval=0.25, report_interval=1.0, duration=None, profiler=None):
+    print(divider())
+    print("SALES ANALYTICS SYSTEM (watch mode)")
+    print(divider())
+
+    catalog_fetch = start_catalog_fetch(prefetch)
+
+    print("\nFetching product data from API...")
+    api_products = wait_for_catalog(catalog_fetch)
+    product_mapping = create_product_mapping(api_products)
+    print(f"✓ Fetched {len(api_products)} products")
+
+    # the loop is not recorded as profiler stages - it would grow the profile without bound
+    set_active_profiler(None)
+    if profiler is not None:
+        profiler.stop()
+
+    tailer = SalesFileTailer(filename, product_mapping, region, min_amount, max_amount)
+    print(f"\nWatching {tailer.data_path} - report refreshed every {report_interval:g}s (Ctrl+C to stop)")
+
+    started = time.monotonic()
+    last_render = None
+    pending_rows = 0
+    changed = False
 
-def main():
     try:
-        print(divider())
-        print("SALES ANALYTICS SYSTEM")
-        print(divider())
+        while duration is None or time.monotonic() - started < duration:
+            resets = (tailer.truncations, tailer.rotations)
+            new_rows = tailer.poll()
+            pending_rows += new_rows
+            # a truncation or rotation re-renders the report even if the file now has no valid rows,
+            # so the totals of the old content do not stay on disk
+            changed = changed or new_rows > 0 or (tailer.truncations, tailer.rotations) != resets
+
+            now = time.monotonic()
+            if changed and (last_render is None or now - last_render >= report_interval):
+                generate_sales_report(tailer.aggregates, tailer.enrichment, quiet=True)
+                summary = tailer.filter_summary
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] +{pending_rows} rows | "
+                      f"Valid: {summary['final_count']} | Invalid: {summary['invalid']} | "
+                      f"Revenue: {format_currency(tailer.aggregates.total_revenue)} - report updated")
+                last_render = now
+                pending_rows = 0
+                changed = False
+
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tailer.close()
+
+    print(f"\n✓ Stopped watching ({tailer.rotations} rotations, {tailer.truncations} truncations)")
+    print(divider())
+    return tailer.aggregates, tailer.filter_summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sales Analytics System")
+    parser.add_argument('--stream', action='store_true',
+                        help="process the file as a constant-memory stream (filters come from the options below)")
+    parser.add_argument('--batch', metavar='SCENARIO_FILE', default=None,
+                        help="evaluate every filter scenario in a JSON file in one pass and write one report per scenario")
+    parser.add_argument('--output-dir', default='output/scenarios', help="report folder for batch mode")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only process lines appended since the last run (filters come from the options below)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="parse the file on this many processes (filters come from the options below)")
+    parser.add_argument('--shards', metavar='DIR_OR_GLOB', default=None,
+                        help="process every sales file in a directory or matching a glob (inside the data folder) "
+                             "on a process pool and write one merged report (uses --workers)")
+    parser.add_argument('--parse-cache', action='store_true',
+                        help="load parsed transactions from a binary cache keyed by the file content (interactive mode)")
+    parser.add_argument('--quarantine-file', default='data/rejected_rows.txt',
+                        help="where streaming mode writes rejected rows with their line number and reason")
+    parser.add_argument('--dedup', choices=DEDUP_MODES, default=None,
+                        help="drop rows whose TransactionID was already seen: exact (hashed ID set) or "
+                             "bloom (fixed-memory Bloom filter with on-disk confirmation) - interactive and streaming modes")
+    parser.add_argument('--dedup-capacity', type=int, default=BLOOM_CAPACITY,
+                        help="number of distinct TransactionIDs the bloom dedup mode is sized for")
+    parser.add_argument('--output-compression', choices=['gzip', 'lzma', 'bz2'], default=None,
+                        help="compress the enriched data file")
+    parser.add_argument('--partition-by', choices=PARTITION_FIELDS, default=None,
+                        help="write the enriched data as one file per Date or Region, with a manifest of row counts")
+    parser.add_argument('--watch', action='store_true',
+                        help="tail the sales file and keep the report current as lines are appended (filters come from the options below)")
+    parser.add_argument('--report-interval', type=float, default=1.0, help="watch mode: seconds between report refreshes")
+    parser.add_argument('--poll-interval', type=float, default=0.25, help="watch mode: seconds between checks for new lines")
+    parser.add_argument('--watch-duration', type=float, default=None, help="watch mode: stop after this many seconds")
+    parser.add_argument('--serve', action='store_true',
+                        help="keep the indexed data in memory and answer analysis queries over HTTP")
+    parser.add_argument('--host', default='127.0.0.1', help="server mode host")
+    parser.add_argument('--port', type=int, default=8765, help="server mode port")
+    parser.add_argument('--no-prefetch', action='store_true',
+                        help="fetch the product catalog only when enrichment starts instead of in the background at startup")
+    parser.add_argument('--distinct-precision', type=int, default=None,
+                        help="count daily unique customers with HyperLogLog sketches of this precision (4-18) instead of exact sets "
+                             "(interactive, streaming and shard modes)")
+    parser.add_argument('--max-groups', type=int, default=None,
+                        help="customer and product groups kept in memory before partial aggregates are spilled to temporary files "
+                             "(interactive and streaming modes, default: no limit)")
+    parser.add_argument('--profile-file', default='output/run_profile.json', help="where the JSON run profile is written")
+    parser.add_argument('--profile-memory', action='store_true', help="record the tracemalloc peak of every stage (slower)")
+    parser.add_argument('--cprofile-stage', default=None,
+                        help="write a cProfile dump for this stage (e.g. parse_transactions, top_customers)")
+    parser.add_argument('--file', default='sales_data.txt', help="sales data file inside the data folder")
+    parser.add_argument('--region', default=None, help="region filter (non-interactive modes)")
+    parser.add_argument('--min-amount', type=float, default=None, help="minimum transaction amount (non-interactive modes)")
+    parser.add_argument('--max-amount', type=float, default=None, help="maximum transaction amount (non-interactive modes)")
+    return parser.parse_args(argv)
+
+
+# save_enriched_data options chosen on the command line
+def enriched_output_options(args):
+    return {'compression': args.output_compression, 'partition_by': args.partition_by}
+
+
+# Interactive mode: the original 10-step pipeline with filter prompts - every step is recorded as a profiler stage
+def run_interactive_pipeline(args, profiler):
+    print(divider())
+    print("SALES ANALYTICS SYSTEM")
+    print(divider())
+
+    # the catalog fetch runs in the background while the file is read, parsed and validated
+    catalog_fetch = start_catalog_fetch(not args.no_prefetch)
+
+    if args.parse_cache:
+        # [1/10] + [2/10] Load parsed data from the binary cache (the file is only parsed if its content changed)
+        print("\n[1/10] Reading sales data...")
+        with profiler.stage('read_sales_data') as stage:
+            table, cache_hit = load_parsed_table(args.file)
+            stage['rows_out'] = len(table)
+        print(f"✓ {'Loaded parsed data from cache' if cache_hit else 'Parsed and cached'}: {len(table)} transactions")
 
+        # the report runs on the memory-mapped columns - rows are only decoded for de-duplication and enrichment
+        print("\n[2/10] Parsing and cleaning data...")
+        transactions = table
+        print(f"✓ Parsed {len(transactions)} records")
+    else:
         # [1/10] Read sales data
         print("\n[1/10] Reading sales data...")
-        raw_lines = read_sales_data("sales_data.txt")
+        with profiler.stage('read_sales_data') as stage:
+            raw_lines = read_sales_data(args.file)
+            stage['rows_out'] = len(raw_lines)
         print(f"✓ Successfully read {len(raw_lines)} transactions")
 
         # [2/10] Parse and clean data
         print("\n[2/10] Parsing and cleaning data...")
-        transactions = parse_transactions(raw_lines)
+        with profiler.stage('parse_transactions', rows_in=len(raw_lines)) as stage:
+            transactions = parse_transactions(raw_lines)
+            stage['rows_out'] = len(transactions)
         print(f"✓ Parsed {len(transactions)} records")
 
-        # [3/10] Display filter options
-        print("\n[3/10] Filter Options Available:")
-        regions = sorted({record['Region'] for record in transactions})
-        amounts = [record['Quantity'] * record['UnitPrice'] for record in transactions]
-
-        print(f"Regions: {', '.join(regions)}")
-        print(f"Amount Range: ₹{min(amounts):,.0f} to ₹{max(amounts):,.0f}")
-
-        apply_filter = input("\nDo you want to filter data? (y/n): ").strip().lower()
-
-        if apply_filter == 'y':
-            region = input("Enter region (or press Enter to skip): ").strip() or None
-
-            min_amount = input("Enter minimum amount (or press Enter to skip): ").strip()
-            min_amount = float(min_amount) if min_amount else None
-
-            max_amount = input("Enter maximum amount (or press Enter to skip): ").strip()
-            max_amount = float(max_amount) if max_amount else None
+    # [3/10] Display filter options
+    print("\n[3/10] Filter Options Available:")
+    with profiler.stage('filter_options', rows_in=len(transactions)):
+        if args.parse_cache:
+            regions = sorted(set(table.categories['Region']))
+            amounts = table.quantity * table.unit_price
+            amount_range = (amounts.min().item(), amounts.max().item())
         else:
-            region = min_amount = max_amount = None
-
-        # [4/10] Validate and filter
-        print("\n[4/10] Validating transactions...")
-        valid_txns, invalid_count, summary = validate_and_filter(
-            transactions,
-            region=region,
-            min_amount=min_amount,
-            max_amount=max_amount
-        )
-        print(f"✓ Valid: {len(valid_txns)} | Invalid: {invalid_count}")
-
-        # [5/10] Analysis (implicit via functions)
-        print("\n[5/10] Analyzing sales data...")
-        _ = calculate_total_revenue(valid_txns)
-        print("✓ Analysis complete")
-
-        # [6/10] Fetch API data
-        print("\n[6/10] Fetching product data from API...")
-        api_products = fetch_all_products()
+            regions = sorted({record['Region'] for record in transactions})
+            amounts = [record['Quantity'] * record['UnitPrice'] for record in transactions]
+            amount_range = (min(amounts), max(amounts))
+
+    print(f"Regions: {', '.join(regions)}")
+    print(f"Amount Range: ₹{amount_range[0]:,.0f} to ₹{amount_range[1]:,.0f}")
+
+    apply_filter = input("\nDo you want to filter data? (y/n): ").strip().lower()
+
+    if apply_filter == 'y':
+        region = input("Enter region (or press Enter to skip): ").strip() or None
+
+        min_amount = input("Enter minimum amount (or press Enter to skip): ").strip()
+        min_amount = float(min_amount) if min_amount else None
+
+        max_amount = input("Enter maximum amount (or press Enter to skip): ").strip()
+        max_amount = float(max_amount) if max_amount else None
+    else:
+        region = min_amount = max_amount = None
+
+    # [4/10] Validate and filter
+    print("\n[4/10] Validating transactions...")
+    with profiler.stage('validate_and_filter', rows_in=len(transactions)) as stage:
+        with open_seen_ids(args.dedup, args.dedup_capacity) as seen_ids:
+            validate = validate_and_filter_table if args.parse_cache else validate_and_filter
+            valid_txns, invalid_count, summary = validate(
+                transactions,
+                region=region,
+                min_amount=min_amount,
+                max_amount=max_amount,
+                seen_ids=seen_ids
+            )
+        stage['rows_out'] = len(valid_txns)
+    print(f"✓ Valid: {len(valid_txns)} | Invalid: {invalid_count}")
+    if args.dedup is not None:
+        print(f"✓ Duplicate TransactionIDs dropped: {summary['duplicates']}")
+
+    # [5/10] Analysis - single pass that builds every group-by used by the report
+    print("\n[5/10] Analyzing sales data...")
+    if args.parse_cache:
+        aggregates = aggregate_table(valid_txns, args.distinct_precision, args.max_groups)
+    else:
+        aggregates = aggregate_transactions(valid_txns, args.distinct_precision, args.max_groups)
+    print("✓ Analysis complete")
+
+    # [6/10] Fetch API data
+    print("\n[6/10] Fetching product data from API...")
+    with profiler.stage('fetch_products') as stage:
+        api_products = wait_for_catalog(catalog_fetch)
         product_mapping = create_product_mapping(api_products)
-        print(f"✓ Fetched {len(api_products)} products")
+        stage['rows_out'] = len(api_products)
+    print(f"✓ Fetched {len(api_products)} products")
+
+    if args.parse_cache:
+        # [7/10] + [8/10] Enrich and save in one stream, decoding the table a chunk of rows at a time
+        print("\n[7/10] Enriching sales data...")
+        enrichment = {'total': 0, 'matched': 0}
+        with profiler.stage('save_enriched_data', rows_in=len(valid_txns)) as stage:
+            enriched_txns = iter_enriched_sales_data(valid_txns.iter_transactions(), product_mapping, enrichment)
+            saved_path = save_enriched_data(enriched_txns, **enriched_output_options(args))
+            stage['rows_out'] = enrichment['total']
+        matched = enrichment['matched']
+        print(f"✓ Enriched {matched}/{enrichment['total']} transactions "
+              f"({matched/enrichment['total']*100:.1f}%)")
 
+        print("\n[8/10] Saving enriched data...")
+        print(f"✓ Saved to {saved_path}")
+    else:
         # [7/10] Enrich sales data
         print("\n[7/10] Enriching sales data...")
-        enriched_txns = enrich_sales_data(valid_txns, product_mapping)
-        matched = sum(1 for record in enriched_txns if record['API_Match'])
+        with profiler.stage('enrich_sales_data', rows_in=len(valid_txns)) as stage:
+            enriched_txns = enrich_sales_data(valid_txns, product_mapping)
+            stage['rows_out'] = len(enriched_txns)
+        enrichment = summarize_enrichment(enriched_txns)
+        matched = enrichment['matched']
         print(f"✓ Enriched {matched}/{len(enriched_txns)} transactions "
               f"({matched/len(enriched_txns)*100:.1f}%)")
-        
+
         # [8/10] Save enriched data
         print("\n[8/10] Saving enriched data...")
-        save_enriched_data(enriched_txns)
-        print("✓ Saved to data/enriched_sales_data.txt")
+        with profiler.stage('save_enriched_data', rows_in=len(enriched_txns)):
+            saved_path = save_enriched_data(enriched_txns, **enriched_output_options(args))
+        print(f"✓ Saved to {saved_path}")
 
-        # [9/10] Generate report
-        print("\n[9/10] Generating report...")
-        generate_sales_report(valid_txns, enriched_txns)
-        print("✓ Report saved to output/sales_report.txt")
+    # [9/10] Generate report
+    print("\n[9/10] Generating report...")
+    with profiler.stage('generate_sales_report', rows_in=aggregates.record_count):
+        generate_sales_report(aggregates, enrichment)
+    print("✓ Report saved to output/sales_report.txt")
 
-        # [10/10] Done
-        print("\n[10/10] Process Complete!")
-        print(divider())
+    # [10/10] Done
+    print("\n[10/10] Process Complete!")
+    print(divider())
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # every run records a profile of its stages next to the report
+    profiler = PipelineProfiler(track_memory=args.profile_memory, cprofile_stage=args.cprofile_stage).start()
+    set_active_profiler(profiler)
+
+    try:
+        if args.stream:
+            with profiler.stage('streaming_pipeline') as stage:
+                aggregates, _ = run_streaming_pipeline(args.file, args.region, args.min_amount, args.max_amount,
+                                                       args.distinct_precision, args.quarantine_file,
+                                                       args.dedup, args.dedup_capacity, enriched_output_options(args),
+                                                       args.max_groups)
+                stage['rows_out'] = aggregates.record_count
+        elif args.batch:
+            with profiler.stage('batch_pipeline'):
+                run_batch_pipeline(args.batch, args.file, args.output_dir, not args.no_prefetch)
+        elif args.incremental:
+            with profiler.stage('incremental_pipeline') as stage:
+                aggregates, _ = run_incremental_pipeline(args.file, args.region, args.min_amount, args.max_amount, not args.no_prefetch,
+                                                         enriched_output_options(args))
+                stage['rows_out'] = aggregates.record_count
+        elif args.watch:
+            with profiler.stage('watch_pipeline') as stage:
+                aggregates, _ = run_watch_pipeline(args.file, args.region, args.min_amount, args.max_amount, not args.no_prefetch,
+                                                   args.poll_interval, args.report_interval, args.watch_duration, profiler)
+                stage['rows_out'] = aggregates.record_count
+        elif args.serve:
+            with profiler.stage('server'):
+                run_server(args.file, args.host, args.port, not args.no_prefetch, profiler)
+        elif args.shards:
+            with profiler.stage('shard_pipeline') as stage:
+                aggregates, _ = run_shard_pipeline(args.shards, args.workers, args.region, args.min_amount, args.max_amount,
+                                                   not args.no_prefetch, args.distinct_precision)
+                stage['rows_out'] = aggregates.record_count
+        elif args.workers:
+            with profiler.stage('parallel_pipeline') as stage:
+                aggregates, _ = run_parallel_pipeline(args.file, args.workers, args.region, args.min_amount, args.max_amount, not args.no_prefetch,
+                                                      enriched_output_options(args))
+                stage['rows_out'] = aggregates.record_count
+        else:
+            run_interactive_pipeline(args, profiler)
     
     except Exception as err:
         print("\nAn error occurred during execution!")
         print(f"Details: {err}")
 
+    finally:
+        set_active_profiler(None)
+        profiler.stop()
+        profile_path = profiler.save(Path(__file__).parent / args.profile_file)
+        print(f"Run profile saved to {profile_path}")
+
 
 if __name__ == "__main__":
     main()
-
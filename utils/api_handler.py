@@ -1,31 +1,275 @@
 import requests
-import csv
+from requests.adapters import HTTPAdapter
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# function to fetch all products from DummyJSON API
-def fetch_all_products():
-    url = 'https://dummyjson.com/products?limit=100'
+from utils.records import EnrichedTransaction
+from utils.enriched_writer import EnrichedDataWriter, WRITER_THREADS
+
+PRODUCTS_URL = 'https://dummyjson.com/products'
+REQUEST_TIMEOUT = 10
+
+# the catalog is fetched page by page - only the fields used by create_product_mapping are requested
+PAGE_SIZE = 100
+PRODUCT_FIELDS = 'id,title,category,brand,rating'
+MAX_CONCURRENT_REQUESTS = 8
+
+# 429 and 5xx responses (and connection errors) are retried with jittered exponential backoff
+MAX_RETRIES = 4
+RETRY_BACKOFF = 0.5
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# longest wait between retries - a larger Retry-After is capped to it, so one response cannot stall a fetch for long
+MAX_RETRY_DELAY = RETRY_BACKOFF * 2 ** MAX_RETRIES
+
+# on-disk product catalog cache - fresh for CATALOG_TTL seconds
+# a stale copy younger than CATALOG_MAX_STALE is returned at once while it is revalidated in the background
+CATALOG_CACHE_FILE = 'data/.product_catalog_cache.json'
+CATALOG_TTL = 6 * 60 * 60
+CATALOG_MAX_STALE = 7 * 24 * 60 * 60
+
+
+# function to resolve a path relative to the project folder
+def _project_path(filename):
+    return Path(__file__).parent.parent / filename
+
+
+# function to load the cached product catalog - returns None if there is no usable cache
+def load_catalog_cache(cache_file=CATALOG_CACHE_FILE):
+    try:
+        with open(_project_path(cache_file), 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(cache, dict) or 'products' not in cache:
+        return None
+    return cache
+
+
+# function to save the product catalog cache (written to a temporary file first, then swapped in)
+def save_catalog_cache(cache, cache_file=CATALOG_CACHE_FILE, log=print):
+    cache_path = _project_path(cache_file)
+    # unique temporary name, a background refresh may be saving at the same time
+    temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            # compact separators keep the cache file small
+            json.dump(cache, f, separators=(',', ':'))
+        os.replace(temp_path, cache_path)
+    except OSError as err:
+        log(f"Failed to save product catalog cache: {err}")
+
+
+# function to create an HTTP session whose connection pool is shared by the concurrent page requests
+def create_session(pool_size=MAX_CONCURRENT_REQUESTS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# function to send a GET request, retrying rate-limited (429), server (5xx) and connection errors
+# waits follow Retry-After when the server sends it, otherwise exponential backoff with full jitter - both at most max_delay
+def get_with_retry(session, url, params=None, headers=None, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, backoff=RETRY_BACKOFF, max_delay=MAX_RETRY_DELAY):
+    for attempt in range(retries + 1):
+        delay = random.uniform(0, min(backoff * (2 ** attempt), max_delay))
+
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                return response
+
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = min(int(retry_after), max_delay)
+
+        time.sleep(delay)
+
+
+# function to build the conditional request headers for a page fetched before - None if it has no validators
+def _conditional_headers(validators):
+    headers = {}
+    if validators and validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators and validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers or None
+
+
+# function to fetch the whole product catalog
+# the first page gives the total count, the remaining pages are fetched concurrently over a pooled session
+# validators holds each page's {'etag', 'last_modified'} from an earlier fetch - every page is revalidated with its own,
+# and total is the earlier catalog total, used when the first page comes back 304 Not Modified
+# returns (list of pages, total) - each page is {'etag', 'last_modified', 'products'}, products is None for a 304
+def fetch_product_pages(url=PRODUCTS_URL, validators=(), total=None, page_size=PAGE_SIZE, fields=PRODUCT_FIELDS, max_workers=MAX_CONCURRENT_REQUESTS, timeout=REQUEST_TIMEOUT):
+    with create_session(max_workers) as session:
+
+        def fetch_page(number):
+            params = {'limit': page_size, 'skip': number * page_size}
+            if fields:
+                params['select'] = fields
+
+            previous = validators[number] if number < len(validators) else None
+            response = get_with_retry(session, url, params=params, headers=_conditional_headers(previous), timeout=timeout)
+            if response.status_code == 304:
+                # only a page sent with validators can be Not Modified - anything else is a broken server or proxy
+                if previous is None:
+                    raise requests.exceptions.HTTPError(
+                        f"304 Not Modified for catalog page {number + 1}, which has no cached copy", response=response)
+                return {**previous, 'products': None}
+
+            response.raise_for_status()  # Raises HTTPError for bad status codes (4xx or 5xx)
+            page = response.json()
+            return {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'products': page.get('products', []),
+                'total': page.get('total'),
+            }
+
+        first_page = fetch_page(0)
+        if first_page['products'] is not None:
+            total = first_page.pop('total') or len(first_page['products'])
+        elif total is None:
+            total = page_size
+
+        # bounded concurrency - at most max_workers requests are in flight
+        pages = [first_page]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for page in pool.map(fetch_page, range(1, -(-total // page_size))):
+                page.pop('total', None)
+                pages.append(page)
+
+    return pages, total
+
+
+# function to request the product catalog, revalidating the cached copy page by page with ETag / Last-Modified
+# pages answered 304 Not Modified keep their cached products, so an edit on any page is picked up
+# returns the (possibly refreshed) cache, raises requests exceptions on network or HTTP errors
+def _refresh_catalog(url, cache, cache_file, timeout, log=print):
+    # caches written before per-page validators were stored are refetched in full
+    cached_pages = cache.get('pages', []) if cache and cache.get('url') == url else []
+    validators = [{'etag': page.get('etag'), 'last_modified': page.get('last_modified')} for page in cached_pages]
 
+    pages, total = fetch_product_pages(url, validators=validators, total=cache.get('total') if cached_pages else None, timeout=timeout)
+
+    # cached products of each page, sliced from the flat list by the stored page sizes
+    cached_products = []
+    start = 0
+    for page in cached_pages:
+        cached_products.append(cache['products'][start:start + page['count']])
+        start += page['count']
+
+    products = []
+    stored_pages = []
+    modified = len(pages) != len(cached_pages)
+    for number, page in enumerate(pages):
+        if page['products'] is None:
+            page_products = cached_products[number]
+        else:
+            page_products = page['products']
+            modified = True
+        products.extend(page_products)
+        stored_pages.append({'etag': page['etag'], 'last_modified': page['last_modified'], 'count': len(page_products)})
+
+    cache = {
+        'url': url,
+        'fetched_at': time.time(),
+        'total': total,
+        'pages': stored_pages,
+        'products': products,
+    }
+    save_catalog_cache(cache, cache_file, log)
+
+    if modified:
+        log(f"Successfully fetched {len(products)} products from API")
+    else:
+        log(f"Product catalog not modified - using {len(products)} cached products")
+    return cache
+
+
+# function to revalidate a stale cache in the background - errors only leave the stale copy in place
+def _refresh_catalog_quietly(url, cache, cache_file, timeout, log=print):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Raises HTTPError for bad status codes (4xx or 5xx)
+        _refresh_catalog(url, cache, cache_file, timeout, log)
+    except requests.exceptions.RequestException as err:
+        log(f"Background refresh of product catalog failed: {err}")
+
+
+# function to fetch all products from DummyJSON API
+# the catalog is cached on disk: a fresh cache skips the network, a stale one is revalidated with a conditional request
+# if the API cannot be reached the cached catalog is used (stale-if-error), an empty list is only returned without a cache
+# status messages go to log - pass e.g. a list's append method to collect them when fetching in the background
+def fetch_all_products(url=PRODUCTS_URL, cache_file=CATALOG_CACHE_FILE, ttl=CATALOG_TTL, max_stale=CATALOG_MAX_STALE, timeout=REQUEST_TIMEOUT, log=print):
+    cache = load_catalog_cache(cache_file) if cache_file else None
+    if cache is not None and cache.get('url') != url:
+        cache = None
+
+    if cache is not None:
+        age = time.time() - cache.get('fetched_at', 0)
+
+        if age < ttl:
+            log(f"Using cached product catalog ({len(cache['products'])} products)")
+            return cache['products']
 
-        data = response.json()
-        products = data.get('products', [])
+        # stale-while-revalidate: serve the cached catalog now, refresh it for the next run
+        # the refresh thread is a daemon - an unreachable API must not hold up exit once the report is done,
+        # and an interrupted refresh only leaves the stale copy (the cache file is replaced atomically)
+        if age < max_stale:
+            log(f"Using stale product catalog ({len(cache['products'])} products), refreshing in background")
+            threading.Thread(
+                target=_refresh_catalog_quietly,
+                args=(url, dict(cache), cache_file, timeout, log),
+                daemon=True,
+            ).start()
+            return cache['products']
+
+    try:
+        if cache_file:
+            cache = _refresh_catalog(url, cache, cache_file, timeout, log)
+            # returns list of product dictionaries
+            return cache['products']
 
-        print(f"Successfully fetched {len(products)} products from API")
-        # returns list of product dictionaries
+        # without a cache file, the catalog is requested directly
+        pages, _ = fetch_product_pages(url, timeout=timeout)
+        products = [product for page in pages for product in page['products']]
+        log(f"Successfully fetched {len(products)} products from API")
         return products
     
     except requests.exceptions.RequestException as err:
         # Handles any errors that occurred during the request
-        print(f"Failed to fetch products from API: {err}")
-        # returns empty list if API fails
+        log(f"Failed to fetch products from API: {err}")
+
+        # falls back to the cached catalog so enrichment still works offline
+        if cache is not None:
+            log(f"Using cached product catalog ({len(cache['products'])} products)")
+            return cache['products']
+
+        # returns empty list if API fails and nothing is cached
         return []
 
 
+# last mapping built by create_product_mapping, reused while the same product list is passed in
+_mapping_memo = {'products': None, 'mapping': None}
+
+
 # function to create a mapping of product IDs to product info
+# memoized per product list - repeated calls with the same list return the same mapping
 def create_product_mapping(api_products):
+    if _mapping_memo['products'] is api_products and _mapping_memo['mapping'] is not None:
+        return _mapping_memo['mapping']
+
     product_mapping = {}
 
     for product in api_products:
@@ -36,64 +280,69 @@ def create_product_mapping(api_products):
             'rating': product.get('rating', 0.0)
         }
 
+    _mapping_memo['products'] = api_products
+    _mapping_memo['mapping'] = product_mapping
+
     # returns dictionary with mapping
     return product_mapping
 
 
-# function to enrich transaction data with API product information
-def enrich_sales_data(transactions, product_mapping):
-    enriched_transactions = []
-
+# function to enrich transactions one at a time with API product information
+# if enrichment_summary is given, its 'total' and 'matched' counters are updated as rows stream through
+def iter_enriched_sales_data(transactions, product_mapping, enrichment_summary=None):
     for record in transactions:
-        # Creates a copy so original data is not mutated
-        enriched_record = record.copy()
-
-        # default values
-        enriched_record['API_Category'] = None
-        enriched_record['API_Brand'] = None
-        enriched_record['API_Rating'] = None
-        enriched_record['API_Match'] = False
-
         try:
             # Extract numeric product ID (e.g., P101 -> 101)
             productID = record['ProductID']
             num_productID = int(productID[1:])
         except (KeyError, ValueError, TypeError):
             # If ProductID is missing or malformed
-            enriched_transactions.append(enriched_record)
-            continue
+            num_productID = None
 
-        # Check if product exists in API mapping and add API fields
-        if num_productID in product_mapping:
-            api_info = product_mapping.get(num_productID)
+        # The enriched record references the original record and the product's API info - nothing is copied
+        # API fields default to None and API_Match to False when the product is not in the API mapping
+        api_info = product_mapping.get(num_productID)
+        enriched_record = EnrichedTransaction(record, api_info)
 
-            enriched_record['API_Category'] = api_info.get('category')
-            enriched_record['API_Brand'] = api_info.get('brand')
-            enriched_record['API_Rating'] = api_info.get('rating')
-            enriched_record['API_Match'] = True
+        if enrichment_summary is not None:
+            enrichment_summary['total'] += 1
+            if api_info is not None:
+                enrichment_summary['matched'] += 1
 
-        enriched_transactions.append(enriched_record)
+        yield enriched_record
 
-    # returns list of enriched transaction dictionaries
-    return enriched_transactions
 
+# function to enrich transaction data with API product information
+def enrich_sales_data(transactions, product_mapping):
+    # returns list of enriched transactions (read like dictionaries)
+    return list(iter_enriched_sales_data(transactions, product_mapping))
 
-# function to save enriched transactions back to file
-def save_enriched_data(enriched_transactions, filename='data/enriched_sales_data.txt'):
-    base = Path(__file__).parent.parent
-    data_path = base / filename
 
-    column_headers = ['TransactionID', 'Date', 'ProductID', 'ProductName', 'Quantity', 'UnitPrice', 'CustomerID', 'Region', 'API_Category', 'API_Brand', 'API_Rating', 'API_Match']
+# function to count enriched transactions and API matches
+def summarize_enrichment(enriched_transactions):
+    total = 0
+    matched = 0
+
+    for record in enriched_transactions:
+        total += 1
+        if record.get('API_Match'):
+            matched += 1
 
-    with open(data_path, 'w', encoding='utf-8', newline='') as f:
+    return {'total': total, 'matched': matched}
 
-        # Create a DictWriter object with the file, fieldnames, and pipe delimiter
-        writer = csv.DictWriter(f, fieldnames=column_headers, delimiter='|')
 
-        # Write the header row
-        writer.writeheader()
+# function to save enriched transactions back to file
+# with append=True the rows are added to the end of an existing file (used by incremental runs)
+# compression ('gzip', 'lzma' or 'bz2') adds the matching suffix to the file name, partition_by ('Date' or 'Region')
+# writes one file per value into a folder next to filename, with a manifest.json of row counts
+# returns the path that was written (relative to the project folder when filename is)
+def save_enriched_data(enriched_transactions, filename='data/enriched_sales_data.txt', append=False,
+                       compression=None, partition_by=None, workers=WRITER_THREADS):
+    base = Path(__file__).parent.parent
+    data_path = base / filename
+
+    with EnrichedDataWriter(data_path, compression, partition_by, append, workers) as writer:
+        writer.write(enriched_transactions)
 
-        # Write all the rows of data
-        # csv.DictWriter automatically serializes None values as empty fields in the pipe-delimited output
-        writer.writerows(enriched_transactions)
-            
\ No newline at end of file
+    output_path = writer.output_path
+    return output_path.relative_to(base).as_posix() if output_path.is_relative_to(base) else str(output_path)
@@ -0,0 +1,130 @@
+import json
+import re
+
+from utils.file_handler import (
+    iter_sales_data,
+    iter_transactions,
+    is_valid_transaction,
+    new_filter_summary
+)
+from utils.data_processor import SalesAggregates
+from utils.api_handler import iter_enriched_sales_data
+
+
+# --------------- BATCH FILTER SCENARIOS ---------------
+
+# A scenario is one region / amount filter combination, e.g.
+# {"name": "north-large", "region": "North", "min_amount": 10000, "max_amount": null}
+# All scenarios are evaluated against a single read of the file - every row is routed to each scenario it matches
+
+# function to load scenarios from a JSON file (a list of scenario objects)
+# each scenario's report is named after it, so names that give the same report file name raise ValueError
+def load_scenarios(scenario_file):
+    with open(scenario_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    scenarios = []
+    # report file name -> name of the scenario that uses it
+    report_names = {}
+    for idx, scenario in enumerate(data, start=1):
+        region = scenario.get('region') or None
+        min_amount = scenario.get('min_amount')
+        max_amount = scenario.get('max_amount')
+
+        name = scenario.get('name') or f"scenario_{idx}"
+        report_name = scenario_filename(name)
+        if report_name in report_names:
+            raise ValueError(f"scenarios {report_names[report_name]!r} and {name!r} would both write the report "
+                             f"{report_name}.txt - give every scenario a unique name")
+        report_names[report_name] = name
+
+        scenarios.append({
+            'name': name,
+            'region': region,
+            'min_amount': float(min_amount) if min_amount is not None else None,
+            'max_amount': float(max_amount) if max_amount is not None else None,
+        })
+
+    return scenarios
+
+
+# function to turn a scenario name into a safe report file name
+def scenario_filename(name):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or 'scenario'
+
+
+# function to evaluate every scenario in one pass over the sales data file
+# each valid row is checked once, then added to the aggregates of every scenario whose filters it passes
+# returns a list of results: the scenario plus its aggregates, filter summary and enrichment counts
+def run_scenarios(filename, scenarios, product_mapping):
+    results = []
+    for scenario in scenarios:
+        results.append({
+            'scenario': scenario,
+            'aggregates': SalesAggregates(),
+            'filter_summary': new_filter_summary(),
+            'enrichment': {'total': 0, 'matched': 0},
+        })
+
+    # scenarios are grouped by normalized region so a row is only compared with the scenarios for its region
+    by_region = {}
+    any_region = []
+    for result in results:
+        region = result['scenario']['region']
+        if region:
+            by_region.setdefault(region.strip().lower(), []).append(result)
+        else:
+            any_region.append(result)
+
+    # counters shared by all scenarios - validation does not depend on the filters
+    shared = {'total_input': 0, 'invalid': 0}
+
+    def valid_rows(transactions):
+        for record in transactions:
+            shared['total_input'] += 1
+            if is_valid_transaction(record):
+                yield record
+            else:
+                shared['invalid'] += 1
+
+    transactions = iter_transactions(iter_sales_data(filename))
+    enriched_rows = iter_enriched_sales_data(valid_rows(transactions), product_mapping)
+
+    valid_count = 0
+
+    for enriched in enriched_rows:
+        record = enriched.record
+        valid_count += 1
+
+        # the amount, region key and API match are worked out once per row, whatever the number of scenarios
+        amount = record['Quantity'] * record['UnitPrice']
+        matched_api = enriched.api_info is not None
+
+        for scenario_results in (by_region.get(record['Region'].strip().lower(), ()), any_region):
+            for result in scenario_results:
+                _route_row(result, record, amount, matched_api)
+
+    for result in results:
+        summary = result['filter_summary']
+        summary['total_input'] = shared['total_input']
+        summary['invalid'] = shared['invalid']
+        # every valid row that reached a scenario was either kept or filtered by amount - the rest failed the region filter
+        summary['filtered_by_region'] = valid_count - summary['final_count'] - summary['filtered_by_amount']
+
+    return results
+
+
+# function to apply a scenario's amount filter to a row that matched its region and add it to the scenario's aggregates
+def _route_row(result, record, amount, matched_api):
+    scenario = result['scenario']
+
+    if (scenario['min_amount'] is not None and amount < scenario['min_amount']) or \
+            (scenario['max_amount'] is not None and amount > scenario['max_amount']):
+        result['filter_summary']['filtered_by_amount'] += 1
+        return
+
+    result['aggregates'].add(record)
+    result['filter_summary']['final_count'] += 1
+    result['enrichment']['total'] += 1
+    if matched_api:
+        result['enrichment']['matched'] += 1
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from utils.file_handler import (
+    get_data_path,
+    detect_encoding,
+    iter_sales_data_from,
+    iter_transactions,
+    iter_valid_transactions,
+    new_filter_summary
+)
+from utils.data_processor import SalesAggregates, aggregate_stream
+
+CHECKPOINT_VERSION = 3
+
+# bytes just before the checkpoint offset that are hashed to detect a rewritten file - a re-run reads this
+# window and the appended data, never the whole history
+TAIL_WINDOW_BYTES = 64 * 1024
+
+
+# function to get the default checkpoint file for a sales data file (stored next to it)
+def get_checkpoint_path(filename):
+    data_path = get_data_path(filename)
+    return data_path.with_name(f".{data_path.name}.checkpoint.json")
+
+
+# function to hash the TAIL_WINDOW_BYTES of a file that end at `offset`
+def hash_file_window(data_path, offset):
+    start = max(0, offset - TAIL_WINDOW_BYTES)
+    with open(data_path, 'rb') as f:
+        f.seek(start)
+        return hashlib.blake2b(f.read(offset - start), digest_size=16).hexdigest()
+
+
+# function to get the (device, inode) of a file - a file replaced by a new one gets a new inode
+def file_identity(data_path):
+    stat = os.stat(data_path)
+    return [stat.st_dev, stat.st_ino]
+
+
+# function to load a checkpoint - returns None if it is missing, unreadable or from another version
+def load_checkpoint(checkpoint_path):
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        return None
+    return checkpoint
+
+
+# function to save a checkpoint - written to a temporary file first so a crash never leaves a half-written checkpoint
+def save_checkpoint(checkpoint_path, checkpoint):
+    checkpoint_path = Path(checkpoint_path)
+    temp_path = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+
+    os.replace(temp_path, checkpoint_path)
+
+
+# function to check that a checkpoint still describes the start of the file
+# the filters must match, the file must be the same one (device and inode), must not have shrunk,
+# and the TAIL_WINDOW_BYTES before the offset must be unchanged - appends never touch them, a rewrite almost always does
+# only that window is read, so checking costs the same however long the file's history is
+def verify_checkpoint(checkpoint, data_path, filters):
+    if checkpoint is None or checkpoint.get('filters') != filters:
+        return False
+
+    offset = checkpoint['offset']
+    if file_identity(data_path) != checkpoint['file_id'] or os.path.getsize(data_path) < offset:
+        return False
+
+    return hash_file_window(data_path, offset) == checkpoint['window_hash']
+
+
+# function to process only the lines appended since the last run and merge them into the saved aggregates
+# falls back to a full rebuild when there is no usable checkpoint
+# a last line without a newline is treated as still being written: it is left out and the checkpoint stops before it,
+# so until the line is terminated (or the next run after it is) the totals differ from a full run by that row
+# update_state(state, new_transactions) can return extra mergeable counters to keep in the checkpoint (e.g. enrichment counts)
+# returns (aggregates, filter_summary, new valid transactions, saved extra state, True if the run was a full rebuild)
+def incremental_ingest(filename, region=None, min_amount=None, max_amount=None, checkpoint_path=None, update_state=None):
+    data_path = get_data_path(filename)
+    checkpoint_path = checkpoint_path or get_checkpoint_path(filename)
+    filters = {'region': region, 'min_amount': min_amount, 'max_amount': max_amount}
+
+    # handle FileNotFoundError
+    if not data_path.exists():
+        print(f"Error: The file {filename} was not found.")
+        return SalesAggregates(), new_filter_summary(), [], {}, True
+
+    checkpoint = load_checkpoint(checkpoint_path)
+
+    if verify_checkpoint(checkpoint, data_path, filters):
+        rebuild = False
+        offset = checkpoint['offset']
+        encoding = checkpoint['encoding']
+        aggregates = SalesAggregates.from_dict(checkpoint['aggregates'])
+        filter_summary = checkpoint['filter_summary']
+        state = checkpoint.get('extra_state', {})
+    else:
+        rebuild = True
+        offset = 0
+        encoding = detect_encoding(data_path)
+        aggregates = SalesAggregates()
+        filter_summary = new_filter_summary()
+        state = {}
+
+    # only the new lines are read, parsed, validated and aggregated
+    position = {}
+    raw_lines = iter_sales_data_from(data_path, offset, encoding, position)
+    valid_txns = iter_valid_transactions(iter_transactions(raw_lines), region, min_amount, max_amount, filter_summary)
+    new_transactions = list(aggregate_stream(valid_txns, aggregates))
+
+    if update_state is not None:
+        state = update_state(state, new_transactions)
+
+    save_checkpoint(checkpoint_path, {
+        'version': CHECKPOINT_VERSION,
+        'source': str(data_path),
+        'encoding': encoding,
+        'offset': position['offset'],
+        'file_id': file_identity(data_path),
+        'window_hash': hash_file_window(data_path, position['offset']),
+        'filters': filters,
+        'filter_summary': filter_summary,
+        'aggregates': aggregates.to_dict(),
+        'extra_state': state,
+    })
+
+    return aggregates, filter_summary, new_transactions, state, rebuild
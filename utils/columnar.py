@@ -0,0 +1,465 @@
+import numpy as np
+
+from utils.file_handler import parse_transactions, is_iso_date
+from utils.data_processor import SalesAggregates
+from utils.money import unit_price_paise, to_rupees, average_paise
+from utils.records import Transaction
+
+# low-cardinality string columns are dictionary-encoded: each value is stored once in a categories list,
+# rows hold integer codes
+STRING_COLUMNS = ['Date', 'ProductName', 'CustomerID', 'Region']
+# identifier columns (unique or nearly unique per row) are stored as fixed-width byte strings instead
+ID_COLUMNS = ['TransactionID', 'ProductID']
+ALL_COLUMNS = ['TransactionID', 'Date', 'ProductID', 'ProductName', 'Quantity', 'UnitPrice', 'CustomerID', 'Region']
+
+# rows converted to typed arrays at a time while a table is built
+BUILD_CHUNK_SIZE = 10000
+
+
+# --------------- COLUMNAR TRANSACTION TABLE ---------------
+
+# Column-oriented alternative to the list of transaction dictionaries
+# Quantity/UnitPrice/amount are typed arrays, low-cardinality string fields are integer codes into per-column
+# categories and IDs are numpy 'S' (UTF-8 bytes) arrays
+# Money is stored as int64 paise (price_paise, amount), so totals are exact like SalesAggregates -
+# the float UnitPrice column is derived from price_paise when it is read
+class TransactionTable:
+    def __init__(self, codes, categories, ids, quantity, price_paise, amount=None):
+        # column name -> int32 array of codes
+        self.codes = codes
+        # column name -> list of distinct values (code i -> categories[name][i])
+        self.categories = categories
+        # column name -> 'S' array of UTF-8 encoded values
+        self.ids = ids
+        self.quantity = np.asarray(quantity, dtype=np.int64)
+        self.price_paise = np.asarray(price_paise, dtype=np.int64)
+        # amount (paise) can be passed in (e.g. a memory-mapped column) instead of being recomputed
+        self.amount = self.quantity * self.price_paise if amount is None else amount
+
+    def __len__(self):
+        return len(self.quantity)
+
+    # UnitPrice in rupees - the same floats the parser produces from the exact paise
+    @property
+    def unit_price(self):
+        return self.price_paise / 100
+
+    # Builds a table from parsed transaction dictionaries (output of parse_transactions / validate_and_filter)
+    @classmethod
+    def from_transactions(cls, transactions, chunk_size=BUILD_CHUNK_SIZE):
+        builder = _TableBuilder()
+        chunk = []
+
+        for record in transactions:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                builder.extend(chunk)
+                chunk = []
+
+        if chunk:
+            builder.extend(chunk)
+
+        return builder.build()
+
+    # Parses raw lines straight into columns, chunk by chunk, so the full list of dictionaries is never held in memory
+    @classmethod
+    def from_lines(cls, raw_lines, chunk_size=BUILD_CHUNK_SIZE):
+        builder = _TableBuilder()
+        chunk = []
+
+        for line in raw_lines:
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                builder.extend(parse_transactions(chunk))
+                chunk = []
+
+        if chunk:
+            builder.extend(parse_transactions(chunk))
+
+        return builder.build()
+
+    # Returns the decoded values of a column as a numpy array
+    def column(self, name):
+        if name == 'Quantity':
+            return self.quantity
+        if name == 'UnitPrice':
+            return self.unit_price
+        if name in self.ids:
+            return np.char.decode(self.ids[name], 'utf-8')
+        categories = np.array(self.categories[name], dtype=object)
+        return categories[self.codes[name]]
+
+    # Returns a new table with the rows selected by a boolean mask or index array (categories are shared)
+    def take(self, rows):
+        codes = {name: column[rows] for name, column in self.codes.items()}
+        ids = {name: column[rows] for name, column in self.ids.items()}
+        return TransactionTable(codes, self.categories, ids, self.quantity[rows], self.price_paise[rows])
+
+    # Converts the table back into a list of Transaction records
+    def to_transactions(self):
+        columns = [self.column(name).tolist() for name in ALL_COLUMNS] + [self.price_paise.tolist()]
+        return [Transaction(*values) for values in zip(*columns)]
+
+    # Yields the rows as Transaction records, converting chunk_size rows at a time
+    def iter_transactions(self, chunk_size=BUILD_CHUNK_SIZE):
+        for start in range(0, len(self), chunk_size):
+            yield from self.take(slice(start, start + chunk_size)).to_transactions()
+
+
+# Converts chunks of records into typed arrays as they arrive - only the category lookups grow with the input
+class _TableBuilder:
+    def __init__(self):
+        self.lookups = {name: {} for name in STRING_COLUMNS}
+        # column name -> list of per-chunk arrays, concatenated once in build
+        self.chunks = {name: [] for name in STRING_COLUMNS + ID_COLUMNS + ['Quantity', 'price_paise']}
+
+    def extend(self, records):
+        records = list(records)
+        chunks = self.chunks
+
+        for name in STRING_COLUMNS:
+            lookup = self.lookups[name]
+            codes = np.empty(len(records), dtype=np.int32)
+            for i, record in enumerate(records):
+                value = record[name]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(lookup)
+                codes[i] = code
+            chunks[name].append(codes)
+
+        for name in ID_COLUMNS:
+            chunks[name].append(np.array([record[name].encode('utf-8') for record in records], dtype=np.bytes_))
+
+        chunks['Quantity'].append(np.fromiter((record['Quantity'] for record in records), dtype=np.int64, count=len(records)))
+        chunks['price_paise'].append(np.fromiter((unit_price_paise(record) for record in records), dtype=np.int64, count=len(records)))
+
+    def build(self):
+        columns = {}
+        for name, chunks in self.chunks.items():
+            columns[name] = np.concatenate(chunks) if chunks else np.empty(0, dtype=_EMPTY_DTYPES.get(name, np.int32))
+            # the per-chunk arrays are released as soon as their column is joined
+            chunks.clear()
+
+        codes = {name: columns[name] for name in STRING_COLUMNS}
+        ids = {name: columns[name] for name in ID_COLUMNS}
+        categories = {name: list(lookup) for name, lookup in self.lookups.items()}
+        return TransactionTable(codes, categories, ids, columns['Quantity'], columns['price_paise'])
+
+
+_EMPTY_DTYPES = {'TransactionID': 'S1', 'ProductID': 'S1', 'Quantity': np.int64, 'price_paise': np.int64}
+
+
+# Groups rows by a code column - groups are numbered in order of first appearance (same as dict insertion order)
+# returns (group id per row, category code per group)
+def _group(codes):
+    unique_codes, first_index, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    order = np.argsort(first_index, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[inverse.ravel()], unique_codes[order]
+
+
+# Sums int64 paise per group - bincount adds in float64, which is exact while every total stays below 2**53 paise
+def _group_sum(group_ids, values, group_count):
+    return np.rint(np.bincount(group_ids, weights=values, minlength=group_count)).astype(np.int64)
+
+
+# Distinct values of a code column within each group, e.g. the products bought by each customer
+# returns one list of names per group
+def _group_members(group_ids, group_count, codes, categories):
+    if group_count == 0:
+        return []
+
+    value_count = len(categories)
+    # sort + mask of repeats - np.unique on int64 keys is many times slower
+    pairs = np.sort(group_ids.astype(np.int64) * value_count + codes)
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    pair_groups, pair_values = np.divmod(pairs, value_count)
+
+    # the pairs are sorted by group and every group has at least one member, so each group is one slice
+    names = np.array(categories, dtype=object)[pair_values].tolist()
+    bounds = [0] + (np.flatnonzero(np.diff(pair_groups)) + 1).tolist() + [len(names)]
+    return [names[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+# Names of the groups returned by _group
+def _group_names(table, name, group_codes):
+    categories = table.categories[name]
+    return [categories[code] for code in group_codes]
+
+
+# --------------- VECTORIZED SALES SUMMARY ---------------
+
+# ------ Calculate Total Revenue ------
+
+# Calculates total revenue from all transactions
+def calculate_total_revenue(table):
+    return to_rupees(int(table.amount.sum()))
+
+# ------ Region-wise Sales Analysis ------
+
+# Analyzes sales by region
+def region_wise_sales(table):
+    group_ids, group_codes = _group(table.codes['Region'])
+    regions = _group_names(table, 'Region', group_codes)
+
+    total_sales = _group_sum(group_ids, table.amount, len(regions))
+    transaction_count = np.bincount(group_ids, minlength=len(regions))
+    grand_total = int(total_sales.sum())
+
+    region_stats = {}
+    for region, sales, count in zip(regions, total_sales.tolist(), transaction_count.tolist()):
+        percentage = (sales/grand_total) * 100 if grand_total > 0 else 0.0
+        region_stats[region] = {
+            'total_sales': to_rupees(sales),
+            'transaction_count': count,
+            'percentage': round(percentage, 2),
+        }
+
+    # Sorts by total_sales in descending order
+    sorted_items = sorted(region_stats.items(), key=lambda item: item[1]['total_sales'], reverse=True)
+    return dict(sorted_items)
+
+# ------ Product Totals ------
+
+# Total quantity and revenue per product, in order of first appearance
+def _product_totals(table):
+    group_ids, group_codes = _group(table.codes['ProductName'])
+    products = _group_names(table, 'ProductName', group_codes)
+
+    total_quantity = np.bincount(group_ids, weights=table.quantity, minlength=len(products)).astype(np.int64)
+    total_revenue = _group_sum(group_ids, table.amount, len(products))
+    return products, total_quantity, total_revenue
+
+# ------ Top Selling Products ------
+
+# Finds top n products by total quantity sold
+def top_selling_products(table, n=5):
+    products, total_quantity, total_revenue = _product_totals(table)
+
+    # stable sort keeps first-seen order for ties, like sorted(..., reverse=True)
+    order = np.argsort(-total_quantity, kind='stable')[:n]
+    return [(products[i], int(total_quantity[i]), to_rupees(int(total_revenue[i]))) for i in order]
+
+# ------ Customer Purchase Analysis ------
+
+# Analyzes customer purchase patterns
+def customer_analysis(table):
+    group_ids, group_codes = _group(table.codes['CustomerID'])
+    customers = _group_names(table, 'CustomerID', group_codes)
+
+    total_spent = _group_sum(group_ids, table.amount, len(customers))
+    purchase_count = np.bincount(group_ids, minlength=len(customers))
+
+    # unique (customer, product) pairs give the products bought per customer
+    products_bought = _group_members(group_ids, len(customers), table.codes['ProductName'], table.categories['ProductName'])
+
+    customer_stats = {}
+    for i, customer in enumerate(customers):
+        spent = int(total_spent[i])
+        count = int(purchase_count[i])
+        customer_stats[customer] = {
+            'total_spent': to_rupees(spent),
+            'purchase_count': count,
+            'products_bought': sorted(products_bought[i]),
+            'avg_order_value': to_rupees(average_paise(spent, count)),
+        }
+
+    # Sorts by total_spent in descending order
+    sorted_items = sorted(customer_stats.items(), key=lambda item: item[1]['total_spent'], reverse=True)
+    return dict(sorted_items)
+
+
+# --------------- VECTORIZED DATE-BASED ANALYSIS ---------------
+
+# Revenue and transaction count per date, in order of first appearance
+def _date_totals(table):
+    group_ids, group_codes = _group(table.codes['Date'])
+    dates = _group_names(table, 'Date', group_codes)
+
+    revenue = _group_sum(group_ids, table.amount, len(dates))
+    transaction_count = np.bincount(group_ids, minlength=len(dates))
+    return group_ids, dates, revenue, transaction_count
+
+# ------ Daily Sales Trend ------
+
+# Analyzes sales trend by date
+def daily_sales_trend(table):
+    group_ids, dates, revenue, transaction_count = _date_totals(table)
+
+    # unique (date, customer) pairs give the unique customers per day
+    customer_count = len(table.categories['CustomerID'])
+    pairs = np.unique(group_ids.astype(np.int64) * customer_count + table.codes['CustomerID'])
+    unique_customers = np.bincount(pairs // customer_count, minlength=len(dates)) if customer_count else np.zeros(len(dates), dtype=np.int64)
+
+    date_stats = {}
+    for i, date in enumerate(dates):
+        date_stats[date] = {
+            'revenue': to_rupees(int(revenue[i])),
+            'transaction_count': int(transaction_count[i]),
+            'unique_customers': int(unique_customers[i]),
+        }
+
+    # Sorts chronologically
+    return dict(sorted(date_stats.items()))
+
+# ------ Find Peak Sales Day ------
+
+# Identifies the date with highest revenue
+def find_peak_sales_day(table):
+    _, dates, revenue, transaction_count = _date_totals(table)
+
+    # argmax returns the first maximum, like max() over the date dictionary
+    peak = int(np.argmax(revenue))
+    return (dates[peak], to_rupees(int(revenue[peak])), int(transaction_count[peak]))
+
+
+# --------------- VECTORIZED PRODUCT PERFORMANCE ---------------
+
+# ------ Low Performing Products ------
+
+# Identifies products with low sales
+def low_performing_products(table, threshold=10):
+    products, total_quantity, total_revenue = _product_totals(table)
+
+    low = np.flatnonzero(total_quantity < threshold)
+    order = low[np.argsort(total_quantity[low], kind='stable')]
+    return [(products[i], int(total_quantity[i]), to_rupees(int(total_revenue[i]))) for i in order]
+
+
+# --------------- VALIDATION AND AGGREGATES ON THE TABLE ---------------
+
+# Per-row mask of a code column from a test of its distinct values - each value is tested once
+def _category_mask(table, name, test):
+    passed = np.array([test(value) for value in table.categories[name]], dtype=bool)
+    return passed[table.codes[name]] if len(passed) else np.zeros(len(table), dtype=bool)
+
+
+# Rows that pass the same rules as file_handler.check_transaction
+def valid_mask(table):
+    valid = (table.quantity > 0) & (table.price_paise > 0)
+    valid &= np.char.startswith(table.ids['TransactionID'], b'T')
+    valid &= np.char.startswith(table.ids['ProductID'], b'P')
+    valid &= _category_mask(table, 'CustomerID', lambda value: value.startswith('C'))
+    valid &= _category_mask(table, 'Date', is_iso_date)
+    for name in ('ProductName', 'Region'):
+        valid &= _category_mask(table, name, lambda value: value != '')
+    return valid
+
+
+# Same validation, filters, messages and summary as file_handler.validate_and_filter, computed on the columns
+# Rows are only decoded for de-duplication (seen_ids), which needs every valid TransactionID
+# returns (filtered table, invalid count, filter summary)
+def validate_and_filter(table, region=None, min_amount=None, max_amount=None, seen_ids=None):
+    valid = valid_mask(table)
+    invalid_count = int(len(table) - valid.sum())
+
+    duplicate_count = 0
+    if seen_ids is not None:
+        positions = np.flatnonzero(valid)
+        for position, transaction_id in zip(positions.tolist(), table.ids['TransactionID'][positions].tolist()):
+            if not seen_ids.add(transaction_id.decode('utf-8')):
+                valid[position] = False
+                duplicate_count += 1
+
+    valid_table = table.take(valid)
+
+    # ------ FILTER DISPLAY ------
+
+    regions_list = sorted(set(_group_names(valid_table, 'Region', np.unique(valid_table.codes['Region']))))
+    print(f"Available regions: {regions_list}")
+
+    # float amounts, the same values the row-based filters compare
+    amounts = valid_table.quantity * valid_table.unit_price
+    if len(amounts):
+        print(f"Transaction amount range: {amounts.min().item()} to {amounts.max().item()}")
+
+    # ------ FILTERING ------
+
+    # a row is counted against the first filter it fails, in the order region -> min amount -> max amount
+    keep = np.ones(len(valid_table), dtype=bool)
+    if region:
+        region_normalized = region.strip().lower()
+        keep &= _category_mask(valid_table, 'Region', lambda value: value.strip().lower() == region_normalized)
+    filtered_by_region = int(len(valid_table) - keep.sum())
+
+    if min_amount is not None:
+        keep &= ~(amounts < float(min_amount))
+    filtered_by_min = int(len(valid_table) - filtered_by_region - keep.sum())
+
+    if max_amount is not None:
+        keep &= ~(amounts > float(max_amount))
+    filtered = valid_table.take(keep)
+    filtered_by_amount = len(valid_table) - filtered_by_region - len(filtered)
+
+    remaining = len(valid_table) - filtered_by_region
+    if region:
+        print(f"Count of records after applying region filter ({region}): {remaining}")
+
+    remaining -= filtered_by_min
+    if min_amount is not None:
+        print(f"Count of records after applying min amount filter ({min_amount}): {remaining}")
+
+    if max_amount is not None:
+        print(f"Count of records after applying max amount filter ({max_amount}): {len(filtered)}")
+
+    filter_summary = {
+        'total_input': len(table),
+        'invalid': invalid_count,
+        'duplicates': duplicate_count,
+        'filtered_by_region': filtered_by_region,
+        'filtered_by_amount': filtered_by_amount,
+        'final_count': len(filtered)
+    }
+
+    return (filtered, invalid_count, filter_summary)
+
+
+# Builds the same SalesAggregates as data_processor.aggregate_transactions with grouped column sums
+# Groups are numbered in order of first appearance, so every dictionary has the same order as a row-by-row build
+# Only the distinct (customer, product) and (date, customer) pairs are turned into Python objects
+# When customers and products exceed max_groups the rows are fed through SalesAggregates.update instead, which spills
+def aggregate_table(table, distinct_precision=None, max_groups=None):
+    aggregates = SalesAggregates(distinct_precision, max_groups)
+    if len(table) == 0:
+        return aggregates
+
+    if max_groups is not None:
+        group_count = len(np.unique(table.codes['CustomerID'])) + len(np.unique(table.codes['ProductName']))
+        if group_count > max_groups:
+            return aggregates.update(table.iter_transactions())
+
+    aggregates.record_count = len(table)
+    aggregates.total_revenue_paise = int(table.amount.sum())
+
+    group_ids, group_codes = _group(table.codes['Region'])
+    regions = _group_names(table, 'Region', group_codes)
+    total_sales = _group_sum(group_ids, table.amount, len(regions))
+    transaction_count = np.bincount(group_ids, minlength=len(regions))
+    aggregates.regions = {region: [sales, count] for region, sales, count in zip(regions, total_sales.tolist(), transaction_count.tolist())}
+
+    products, total_quantity, total_revenue = _product_totals(table)
+    aggregates.products = {product: [quantity, revenue] for product, quantity, revenue in zip(products, total_quantity.tolist(), total_revenue.tolist())}
+
+    group_ids, group_codes = _group(table.codes['CustomerID'])
+    customers = _group_names(table, 'CustomerID', group_codes)
+    total_spent = _group_sum(group_ids, table.amount, len(customers))
+    purchase_count = np.bincount(group_ids, minlength=len(customers))
+    products_bought = _group_members(group_ids, len(customers), table.codes['ProductName'], table.categories['ProductName'])
+    aggregates.customers = {
+        customer: [spent, count, set(bought)]
+        for customer, spent, count, bought in zip(customers, total_spent.tolist(), purchase_count.tolist(), products_bought)
+    }
+
+    group_ids, dates, revenue, transaction_count = _date_totals(table)
+    date_customers = _group_members(group_ids, len(dates), table.codes['CustomerID'], table.categories['CustomerID'])
+    for date, day_revenue, count, day_customers in zip(dates, revenue.tolist(), transaction_count.tolist(), date_customers):
+        customer_set = aggregates._new_customer_set()
+        for customer in day_customers:
+            customer_set.add(customer)
+        aggregates.dates[date] = [day_revenue, count, customer_set]
+    aggregates.min_date = min(dates)
+    aggregates.max_date = max(dates)
+
+    return aggregates
@@ -1,45 +1,313 @@
+import heapq
+import tempfile
+from datetime import date as calendar_date
+
+from utils.money import unit_price_paise, to_rupees, average_paise
+from utils.profiler import profiled
+from utils.sketches import HyperLogLog, SpaceSaving
+from utils.spill import SPILL_PARTITIONS, SPILL_BATCH_SIZE, SpilledGroups
+
+# --------------- AGGREGATION ENGINE ---------------
+
+# Holds every group-by used by the analysis functions, built in a single scan
+# All analysis functions below accept either a list of transactions or a SalesAggregates object
+# With distinct_precision set, each day's customers are counted by a HyperLogLog sketch of that precision
+# instead of an exact set - memory per day is then fixed (2**precision bytes) whatever the number of customers
+# Money is summed as integer paise, so totals are exact and do not depend on the order rows or partial
+# aggregates are added in - the analysis functions convert to rupees only for their results
+# With max_groups set, the customer and product tables are spilled to temporary files whenever together they hold
+# more than max_groups entries, and merged partition by partition when read (customer_items / product_items)
+# - self.customers / self.products then only hold the groups added since the last spill
+class SalesAggregates:
+    def __init__(self, distinct_precision=None, max_groups=None):
+        self.distinct_precision = distinct_precision
+        self.max_groups = max_groups
+        self._spill_dir = None
+        self._spilled = None
+        self.record_count = 0
+        self.total_revenue_paise = 0
+        self.min_date = None
+        self.max_date = None
+
+        # region -> [total_sales (paise), transaction_count]
+        self.regions = {}
+        # product -> [total_quantity, total_revenue (paise)]
+        self.products = {}
+        # customer -> [total_spent (paise), purchase_count, set of products bought]
+        self.customers = {}
+        # date -> [revenue (paise), transaction_count, set of customers (or HyperLogLog sketch)]
+        self.dates = {}
+
+    # Total revenue in rupees
+    @property
+    def total_revenue(self):
+        return to_rupees(self.total_revenue_paise)
+
+    # Returns (customer, [total_spent, purchase_count, set of products bought]) for every customer, in first-seen order
+    def customer_items(self):
+        if self._spilled is None:
+            return self.customers.items()
+        customers, _ = self._spilled
+        if self.customers:
+            customers.spill(self.customers)
+        return customers.items()
+
+    # Returns (product, [total_quantity, total_revenue]) for every product, in first-seen order
+    def product_items(self):
+        if self._spilled is None:
+            return self.products.items()
+        _, products = self._spilled
+        if self.products:
+            products.spill(self.products)
+        return products.items()
+
+    # Spills the customer and product tables once they hold more than max_groups entries together
+    def _limit_groups(self):
+        if self.max_groups is None or len(self.customers) + len(self.products) <= self.max_groups:
+            return
+
+        if self._spilled is None:
+            # the directory is removed by close(), or when the aggregates are garbage collected
+            self._spill_dir = tempfile.TemporaryDirectory(prefix='sales_aggregates_')
+            # reading back holds one batch per partition - batches are sized so that stays within max_groups
+            batch_size = max(1, min(SPILL_BATCH_SIZE, self.max_groups // SPILL_PARTITIONS))
+            self._spilled = (
+                SpilledGroups('customers', _combine_customer_stats, self._spill_dir.name, batch_size=batch_size),
+                SpilledGroups('products', _combine_product_stats, self._spill_dir.name, batch_size=batch_size),
+            )
+
+        customers, products = self._spilled
+        customers.spill(self.customers)
+        products.spill(self.products)
+
+    # Removes the spill files - spilled customers and products are no longer available afterwards
+    def close(self):
+        if self._spill_dir is not None:
+            self._spill_dir.cleanup()
+            self._spill_dir = None
+            self._spilled = None
+
+    # Returns an empty distinct-customer counter for a new date - an exact set or a HyperLogLog sketch
+    def _new_customer_set(self):
+        if self.distinct_precision is None:
+            return set()
+        return HyperLogLog(self.distinct_precision)
+
+    # Adds transactions to the running aggregates - Quantity * UnitPrice is computed once per record, in paise
+    def update(self, transactions):
+        regions = self.regions
+        products = self.products
+        customers = self.customers
+        dates = self.dates
+        total_revenue = self.total_revenue_paise
+        record_count = self.record_count
+
+        for record in transactions:
+            quantity = record['Quantity']
+            amount = quantity * unit_price_paise(record)
+            region = record['Region']
+            product = record['ProductName']
+            customer = record['CustomerID']
+            date = record['Date']
+
+            total_revenue += amount
+            record_count += 1
+
+            stats = regions.get(region)
+            if stats is None:
+                regions[region] = [amount, 1]
+            else:
+                stats[0] += amount
+                stats[1] += 1
+
+            stats = products.get(product)
+            if stats is None:
+                products[product] = [quantity, amount]
+                self._limit_groups()
+            else:
+                stats[0] += quantity
+                stats[1] += amount
+
+            stats = customers.get(customer)
+            if stats is None:
+                customers[customer] = [amount, 1, {product}]
+                self._limit_groups()
+            else:
+                stats[0] += amount
+                stats[1] += 1
+                stats[2].add(product)
+
+            stats = dates.get(date)
+            if stats is None:
+                date_customers = self._new_customer_set()
+                date_customers.add(customer)
+                dates[date] = [amount, 1, date_customers]
+                self._track_date(date)
+            else:
+                stats[0] += amount
+                stats[1] += 1
+                stats[2].add(customer)
+
+        self.total_revenue_paise = total_revenue
+        self.record_count = record_count
+
+        return self
+
+    # Keeps the date range up to date - dates are ISO formatted (YYYY-MM-DD), so string comparison is chronological
+    def _track_date(self, date):
+        if self.min_date is None or date < self.min_date:
+            self.min_date = date
+        if self.max_date is None or date > self.max_date:
+            self.max_date = date
+
+    # Adds a single transaction to the running aggregates
+    def add(self, record):
+        return self.update((record,))
+
+    # Merges another SalesAggregates object (e.g. a partial result for one chunk of a file) into this one
+    def merge(self, other):
+        if other.distinct_precision != self.distinct_precision:
+            raise ValueError("cannot merge aggregates with different distinct customer precision")
+
+        self.total_revenue_paise += other.total_revenue_paise
+        self.record_count += other.record_count
+
+        for region, (sales, count) in other.regions.items():
+            stats = self.regions.setdefault(region, [0, 0])
+            stats[0] += sales
+            stats[1] += count
+
+        # new groups are stored complete before the group limit is checked, so a spill never loses a partial update
+        for product, (quantity, revenue) in other.product_items():
+            stats = self.products.get(product)
+            if stats is None:
+                self.products[product] = [quantity, revenue]
+                self._limit_groups()
+            else:
+                stats[0] += quantity
+                stats[1] += revenue
+
+        for customer, (spent, count, products_bought) in other.customer_items():
+            stats = self.customers.get(customer)
+            if stats is None:
+                self.customers[customer] = [spent, count, set(products_bought)]
+                self._limit_groups()
+            else:
+                stats[0] += spent
+                stats[1] += count
+                stats[2].update(products_bought)
+
+        for date, (revenue, count, date_customers) in other.dates.items():
+            stats = self.dates.get(date)
+            if stats is None:
+                stats = self.dates[date] = [0, 0, self._new_customer_set()]
+                self._track_date(date)
+            stats[0] += revenue
+            stats[1] += count
+            stats[2].update(date_customers)
+
+        return self
+
+    # Converts the aggregates to plain JSON-compatible data (used to save checkpoints)
+    def to_dict(self):
+        if self.distinct_precision is None:
+            dates = {date: [revenue, count, sorted(date_customers)] for date, (revenue, count, date_customers) in self.dates.items()}
+        else:
+            dates = {date: [revenue, count, date_customers.to_dict()] for date, (revenue, count, date_customers) in self.dates.items()}
+
+        return {
+            'distinct_precision': self.distinct_precision,
+            'record_count': self.record_count,
+            'total_revenue_paise': self.total_revenue_paise,
+            'min_date': self.min_date,
+            'max_date': self.max_date,
+            'regions': self.regions,
+            'products': {product: list(stats) for product, stats in self.product_items()},
+            'customers': {customer: [spent, count, sorted(products_bought)] for customer, (spent, count, products_bought) in self.customer_items()},
+            'dates': dates,
+        }
+
+    # Rebuilds aggregates saved with to_dict
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls(data.get('distinct_precision'))
+        aggregates.record_count = data['record_count']
+        aggregates.total_revenue_paise = data['total_revenue_paise']
+        aggregates.min_date = data['min_date']
+        aggregates.max_date = data['max_date']
+        aggregates.regions = {region: list(stats) for region, stats in data['regions'].items()}
+        aggregates.products = {product: list(stats) for product, stats in data['products'].items()}
+        aggregates.customers = {customer: [spent, count, set(products_bought)] for customer, (spent, count, products_bought) in data['customers'].items()}
+        if aggregates.distinct_precision is None:
+            aggregates.dates = {date: [revenue, count, set(date_customers)] for date, (revenue, count, date_customers) in data['dates'].items()}
+        else:
+            aggregates.dates = {date: [revenue, count, HyperLogLog.from_dict(date_customers)] for date, (revenue, count, date_customers) in data['dates'].items()}
+        return aggregates
+
+
+def _combine_customer_stats(stats, other):
+    stats[0] += other[0]
+    stats[1] += other[1]
+    stats[2].update(other[2])
+
+
+def _combine_product_stats(stats, other):
+    stats[0] += other[0]
+    stats[1] += other[1]
+
+
+# Builds every group-by (region, product, customer, date) in one pass over the transactions
+# distinct_precision switches the per-day unique customer counts to HyperLogLog sketches
+# max_groups bounds the customer and product entries held in memory - the rest are spilled to temporary files
+@profiled
+def aggregate_transactions(transactions, distinct_precision=None, max_groups=None):
+    return SalesAggregates(distinct_precision, max_groups).update(transactions)
+
+
+# Adds each transaction to the aggregates as it streams past and passes it on unchanged
+# Lets aggregation run inside a generator pipeline without holding the transactions in memory
+def aggregate_stream(transactions, aggregates):
+    for record in transactions:
+        aggregates.add(record)
+        yield record
+
+
+# Returns the aggregates for the given input - reuses them if they were already built
+def _as_aggregates(transactions, distinct_precision=None):
+    if isinstance(transactions, SalesAggregates):
+        return transactions
+    return aggregate_transactions(transactions, distinct_precision)
+
+
 # --------------- SALES SUMMARY CALCULATOR ---------------
 
 # ------ Calculate Total Revenue ------
 
 # Calculates total revenue from all transactions
+@profiled
 def calculate_total_revenue(transactions):
-    # Total revenue will be a float value
-    total_revenue = 0.0
+    aggregates = _as_aggregates(transactions)
 
-    for record in transactions:
-        total_revenue += record['Quantity'] * record['UnitPrice']
-    
-    return round(total_revenue, 2)
+    # Total revenue in rupees - the sum itself is exact (paise)
+    return to_rupees(aggregates.total_revenue_paise)
 
 # ------ Region-wise Sales Analysis ------
 
 # Analyzes sales by region
+@profiled
 def region_wise_sales(transactions):
+    aggregates = _as_aggregates(transactions)
+    grand_total = aggregates.total_revenue_paise
     region_stats = {}
-    grand_total = 0.0
-
-    # Calculates total sales and transaction count per region
-    for record in transactions:
-        region = record['Region']
-        amount = record['Quantity'] * record['UnitPrice']
-
-        grand_total += amount
-
-        if region not in region_stats:
-            region_stats[region] = {
-                'total_sales': 0.0,
-                'transaction_count': 0,
-            }
-
-        region_stats[region]['total_sales'] += amount
-        region_stats[region]['transaction_count'] += 1
 
     # Calculates percentage of total sales
-    for region in region_stats.values():
-        percentage = (region['total_sales']/grand_total) * 100 if grand_total > 0 else 0.0
-        region['percentage'] = round(percentage, 2)
-        region['total_sales'] = round(region['total_sales'], 2)
+    for region, (total_sales, transaction_count) in aggregates.regions.items():
+        percentage = (total_sales/grand_total) * 100 if grand_total > 0 else 0.0
+        region_stats[region] = {
+            'total_sales': to_rupees(total_sales),
+            'transaction_count': transaction_count,
+            'percentage': round(percentage, 2),
+        }
 
     # Sorts by total_sales in descending order
     items = region_stats.items()
@@ -52,63 +320,49 @@ def region_wise_sales(transactions):
 # ------ Top Selling Products ------
 
 # Finds top n products by total quantity sold
+@profiled
 def top_selling_products(transactions, n=5):
-    product_stats = {}
+    aggregates = _as_aggregates(transactions)
 
-    # Calculates total quantity sold and total revenue for each product
-    for record in transactions:
-        product = record['ProductName']
-        quantity = record['Quantity']
-        amount = quantity * record['UnitPrice']
+    # Keeps the n largest by total_quantity with a heap - O(N log n) instead of sorting every product
+    # nlargest is stable like sorted(..., reverse=True), so ties keep first-seen order
+    top_items = heapq.nlargest(n, aggregates.product_items(), key=lambda item: item[1][0])
+    top_sorted_products = [(product, quantity, to_rupees(revenue)) for product, (quantity, revenue) in top_items]
+    
+    # Returns top n products (list of tuples)
+    return top_sorted_products
 
-        if product not in product_stats:
-            product_stats[product] = {
-                'total_quantity': 0,
-                'total_revenue': 0.0,
-            }
+# ------ Approximate Top Selling Products ------
 
-        product_stats[product]['total_quantity'] += quantity
-        product_stats[product]['total_revenue'] += amount
+# Finds the top n products by quantity in one pass with a fixed memory budget (Space-Saving sketch)
+# Only `capacity` products are held at a time, so the full product list is never built
+# Each tuple is (product, estimated quantity, revenue seen while tracked, max overestimate of the quantity)
+@profiled
+def approximate_top_selling_products(transactions, n=5, capacity=1000):
+    sketch = SpaceSaving(capacity)
 
-    products_list = [(product,stats['total_quantity'],round(stats['total_revenue'], 2)) for product, stats in product_stats.items()]
+    for record in transactions:
+        quantity = record['Quantity']
+        sketch.update(record['ProductName'], quantity, quantity * unit_price_paise(record))
 
-    # Sorts by total_quantity in descending order
-    sorted_products = sorted(products_list, key=lambda item: item[1], reverse=True)
-    top_sorted_products = sorted_products[:n]
-    
-    # Returns top n products (list of tuples)
-    return top_sorted_products
+    return [(product, quantity, to_rupees(revenue), error) for product, quantity, error, revenue in sketch.top(n)]
 
 # ------ Customer Purchase Analysis ------
 
 # Analyzes customer purchase patterns
+@profiled
 def customer_analysis(transactions):
+    aggregates = _as_aggregates(transactions)
     customer_stats = {}
 
-    # Calculates total amount spent and total count of purchases per customer
-    # Creates list of unique products bought per customer
-    for record in transactions:
-        customer = record['CustomerID']
-        amount = record['Quantity'] * record['UnitPrice']
-        product = record['ProductName']
-
-        if customer not in customer_stats:
-            customer_stats[customer] = {
-                'total_spent': 0.0,
-                'purchase_count': 0,
-                'products_bought': set()
-            }
-
-        customer_stats[customer]['total_spent'] += amount
-        customer_stats[customer]['purchase_count'] += 1
-        customer_stats[customer]['products_bought'].add(product)
-
-    # Calculates average order value
-    for customer in customer_stats.values():
-        average_order_value = customer['total_spent']/customer['purchase_count']
-        customer['avg_order_value'] = round(average_order_value,2)
-        customer['total_spent'] = round(customer['total_spent'], 2)
-        customer['products_bought'] = sorted(customer['products_bought'])
+    # Calculates average order value and list of unique products bought per customer
+    for customer, (total_spent, purchase_count, products_bought) in aggregates.customer_items():
+        customer_stats[customer] = {
+            'total_spent': to_rupees(total_spent),
+            'purchase_count': purchase_count,
+            'products_bought': sorted(products_bought),
+            'avg_order_value': to_rupees(average_paise(total_spent, purchase_count)),
+        }
 
     # Sorts by total_spent in descending order
     items = customer_stats.items()
@@ -117,6 +371,41 @@ def customer_analysis(transactions):
 
     # Returns dictionary of customer statistics
     return sorted_customer_stats
+
+# ------ Top Customers ------
+
+# Finds the top n customers by total spent - same order and statistics as the first n of customer_analysis,
+# but only the top n are sorted and have their product lists built
+@profiled
+def top_customers(transactions, n=5):
+    aggregates = _as_aggregates(transactions)
+
+    top_items = heapq.nlargest(n, aggregates.customer_items(), key=lambda item: item[1][0])
+
+    top_customer_stats = {}
+    for customer, (total_spent, purchase_count, products_bought) in top_items:
+        top_customer_stats[customer] = {
+            'total_spent': to_rupees(total_spent),
+            'purchase_count': purchase_count,
+            'products_bought': sorted(products_bought),
+            'avg_order_value': to_rupees(average_paise(total_spent, purchase_count)),
+        }
+
+    # Returns dictionary of the top n customers' statistics
+    return top_customer_stats
+
+# ------ Approximate Top Customers ------
+
+# Finds the top n customers by amount spent in one pass with a fixed memory budget (Space-Saving sketch)
+# Each tuple is (customer, estimated total spent, purchases seen while tracked, max overestimate of the total)
+@profiled
+def approximate_top_customers(transactions, n=5, capacity=1000):
+    sketch = SpaceSaving(capacity)
+
+    for record in transactions:
+        sketch.update(record['CustomerID'], record['Quantity'] * unit_price_paise(record), 1)
+
+    return [(customer, to_rupees(spent), purchases, to_rupees(error)) for customer, spent, error, purchases in sketch.top(n)]
     
 
 # --------------- DATE-BASED ANALYSIS ---------------
@@ -124,30 +413,20 @@ def customer_analysis(transactions):
 # ------ Daily Sales Trend ------
 
 # Analyzes sales trend by date
-def daily_sales_trend(transactions):
+# approximate=True counts unique customers with a HyperLogLog sketch per day (standard error ~1.04 / sqrt(2**precision))
+# instead of keeping every CustomerID - prebuilt aggregates keep the mode they were built with
+@profiled
+def daily_sales_trend(transactions, approximate=False, precision=12):
+    aggregates = _as_aggregates(transactions, precision if approximate else None)
     date_stats = {}
 
-    # Calculates daily revenue and count of daily transactions
-    for record in transactions:
-        date = record['Date']
-        amount = record['Quantity'] * record['UnitPrice']
-        customer = record['CustomerID']
-
-        if date not in date_stats:
-            date_stats[date] = {
-                'revenue': 0.0,
-                'transaction_count': 0,
-                'customers': set()
-            }
-        
-        date_stats[date]['revenue'] += amount
-        date_stats[date]['transaction_count'] += 1
-        date_stats[date]['customers'].add(customer)
-
-    # Counts unique customers per day - converts customer set to counts
-    for stats in date_stats.values():
-        stats['unique_customers'] = len(stats['customers'])
-        del stats['customers']
+    # Counts unique customers per day - converts customer set (or sketch) to counts
+    for date, (revenue, transaction_count, customers) in aggregates.dates.items():
+        date_stats[date] = {
+            'revenue': to_rupees(revenue),
+            'transaction_count': transaction_count,
+            'unique_customers': len(customers),
+        }
 
     # Sorts chronologically
     sorted_date_stats = dict(sorted(date_stats.items()))
@@ -155,32 +434,49 @@ def daily_sales_trend(transactions):
     # Returns dictionary of daily sales statistics, sorted by date
     return sorted_date_stats
 
-# ------ Find Peak Sales Day ------
+# ------ Unique Customers By Period ------
 
-# Identifies the date with highest revenue
-def find_peak_sales_day(transactions):
-    date_stats = {}
+# Returns the key of the week (ISO year and week, e.g. 2024-W05) or month (e.g. 2024-01) a date falls in
+def period_key(date, period='week'):
+    if period == 'month':
+        return date[:7]
+    if period == 'week':
+        year, week, _ = calendar_date.fromisoformat(date).isocalendar()
+        return f"{year}-W{week:02d}"
+    raise ValueError("period must be 'week' or 'month'")
 
-    # Aggregates revenue and transaction count per date
-    for record in transactions:
-        date = record['Date']
-        amount = record['Quantity'] * record['UnitPrice']
 
-        if date not in date_stats:
-            date_stats[date] = {
-                'revenue': 0.0,
-                'transaction_count': 0,
-            }
+# Counts unique customers per week or month by merging the daily customer sets (or HyperLogLog sketches)
+# A customer who buys on several days of the period is counted once
+@profiled
+def unique_customers_by_period(transactions, period='week', approximate=False, precision=12):
+    aggregates = _as_aggregates(transactions, precision if approximate else None)
+    merged = {}
+
+    for date, (_, _, customers) in sorted(aggregates.dates.items()):
+        key = period_key(date, period)
+        period_customers = merged.get(key)
+        if period_customers is None:
+            merged[key] = customers.copy()
+        else:
+            period_customers.update(customers)
+
+    # Returns dictionary of period -> unique customer count, in chronological order
+    return {key: len(customers) for key, customers in merged.items()}
 
-        date_stats[date]['revenue'] += amount
-        date_stats[date]['transaction_count'] += 1
+# ------ Find Peak Sales Day ------
+
+# Identifies the date with highest revenue
+@profiled
+def find_peak_sales_day(transactions):
+    aggregates = _as_aggregates(transactions)
 
     # Find peak sales day
-    items = date_stats.items()
-    peak_date, stats = max(items, key=lambda item: item[1]['revenue'])
+    items = aggregates.dates.items()
+    peak_date, stats = max(items, key=lambda item: item[1][0])
     
     # returns a tuple for date with highest revenue
-    return (peak_date, stats['revenue'], stats['transaction_count'])
+    return (peak_date, to_rupees(stats[0]), stats[1])
 
 
 # --------------- PRODUCT PERFORMANCE ---------------
@@ -188,33 +484,19 @@ def find_peak_sales_day(transactions):
 # ------ Low Performing Products ------
 
 # Identifies products with low sales
+@profiled
 def low_performing_products(transactions, threshold=10):
-    product_stats = {}
-
-    # Calculates total quantity sold and total revenue for each product
-    for record in transactions:
-        product = record['ProductName']
-        quantity = record['Quantity']
-        amount = quantity * record['UnitPrice']
-
-        if product not in product_stats:
-            product_stats[product] = {
-                'total_quantity': 0,
-                'total_revenue': 0.0,
-            }
-
-        product_stats[product]['total_quantity'] += quantity
-        product_stats[product]['total_revenue'] += amount
+    aggregates = _as_aggregates(transactions)
 
     # Filter low-performing products - products with total quantity < threshold
     low_performers = []
 
-    for product, stats in product_stats.items():
-        if stats['total_quantity'] < threshold:
-            low_performers.append((product, stats['total_quantity'], stats['total_revenue']))
+    for product, (quantity, revenue) in aggregates.product_items():
+        if quantity < threshold:
+            low_performers.append((product, quantity, to_rupees(revenue)))
 
     # Sorts by total_quantity in ascending order
     low_performers.sort(key=lambda item: item[1])
     
     # Returns products with low sales (list of tuples)
-    return low_performers
\ No newline at end of file
+    return low_performers
@@ -0,0 +1,148 @@
+import hashlib
+import math
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+DEDUP_MODES = ('exact', 'bloom')
+
+# expected number of distinct TransactionIDs the Bloom filter is sized for
+BLOOM_CAPACITY = 10_000_000
+
+# false positive rate of the Bloom filter at capacity - only false positives reach the on-disk confirmation
+BLOOM_ERROR_RATE = 0.01
+
+# hashed IDs buffered in memory before they are written to the confirmation table
+CONFIRM_BATCH_SIZE = 100_000
+
+
+# function to hash a TransactionID to a 64-bit integer (stable across runs and processes)
+def hash_transaction_id(transaction_id):
+    return int.from_bytes(hashlib.blake2b(transaction_id.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+# --------------- EXACT MODE ---------------
+
+# Set of seen TransactionIDs, stored as 64-bit hashes instead of the ID strings
+# (a collision between two different IDs has a probability of about n**2 / 2**65 - negligible below billions of rows)
+class SeenTransactionIds:
+    def __init__(self):
+        self.hashes = set()
+
+    # records an ID - returns True the first time it is seen, False for a duplicate
+    def add(self, transaction_id):
+        hashed = hash_transaction_id(transaction_id)
+        if hashed in self.hashes:
+            return False
+        self.hashes.add(hashed)
+        return True
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def close(self):
+        self.hashes = set()
+
+
+# --------------- BOUNDED-MEMORY MODE ---------------
+
+# Bloom filter over the hashed IDs, sized for `capacity` IDs at `error_rate` false positives
+# (about 1.2 MB per million IDs at 1%), with exact confirmation of suspected duplicates:
+# every hashed ID is also written to a temporary on-disk table, which is only read when the Bloom filter
+# reports a hit - so memory stays fixed while duplicates are still counted exactly
+class BloomTransactionIds:
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE, spill_dir=None):
+        self.bit_count = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+        self.suspected = 0
+
+        # confirmation table - hashed IDs not yet written are kept in `pending`
+        handle, self.spill_path = tempfile.mkstemp(prefix='transaction_ids_', suffix='.sqlite', dir=spill_dir)
+        os.close(handle)
+        self.connection = sqlite3.connect(self.spill_path)
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute("CREATE TABLE seen (hash INTEGER PRIMARY KEY)")
+        self.pending = set()
+
+    # records an ID - returns True the first time it is seen, False for a duplicate
+    def add(self, transaction_id):
+        hashed = hash_transaction_id(transaction_id)
+        bits = self.bits
+        bit_count = self.bit_count
+
+        # bit positions come from double hashing with the two 32-bit halves of the hash
+        # they are set while checked - if all of them were already set, the ID may have been seen
+        first = hashed >> 32
+        second = (hashed & 0xFFFFFFFF) | 1
+        maybe_seen = True
+        for i in range(self.hash_count):
+            position = (first + i * second) % bit_count
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                maybe_seen = False
+                bits[position >> 3] |= mask
+
+        # the Bloom filter may be wrong - suspected duplicates are confirmed against the exact hashes
+        if maybe_seen:
+            self.suspected += 1
+            if self._confirm(hashed):
+                return False
+
+        self.pending.add(hashed)
+        if len(self.pending) >= CONFIRM_BATCH_SIZE:
+            self._flush()
+        self.count += 1
+        return True
+
+    def _confirm(self, hashed):
+        if hashed in self.pending:
+            return True
+        # SQLite integers are signed 64-bit
+        row = self.connection.execute("SELECT 1 FROM seen WHERE hash = ?", (_signed(hashed),)).fetchone()
+        return row is not None
+
+    def _flush(self):
+        self.connection.executemany("INSERT INTO seen (hash) VALUES (?)", ((_signed(hashed),) for hashed in self.pending))
+        self.connection.commit()
+        self.pending = set()
+
+    def __len__(self):
+        return self.count
+
+    # removes the confirmation table
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+            os.remove(self.spill_path)
+
+
+def _signed(hashed):
+    return hashed - (1 << 64) if hashed >= (1 << 63) else hashed
+
+
+# function to create the seen-ID set for a dedup mode ('exact' or 'bloom'), or None when dedup is off
+def new_seen_ids(mode=None, capacity=BLOOM_CAPACITY):
+    if mode is None:
+        return None
+    if mode == 'exact':
+        return SeenTransactionIds()
+    if mode == 'bloom':
+        return BloomTransactionIds(capacity)
+    raise ValueError(f"unknown dedup mode {mode} - expected one of {DEDUP_MODES}")
+
+
+# context manager around new_seen_ids - the set is closed (and a Bloom confirmation table removed)
+# however the block exits, including on errors and Ctrl+C
+@contextmanager
+def open_seen_ids(mode=None, capacity=BLOOM_CAPACITY):
+    seen_ids = new_seen_ids(mode, capacity)
+    try:
+        yield seen_ids
+    finally:
+        if seen_ids is not None:
+            seen_ids.close()
@@ -0,0 +1,181 @@
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from utils.records import TRANSACTION_FIELDS, API_FIELDS
+
+ENRICHED_FIELDS = TRANSACTION_FIELDS + API_FIELDS
+
+# compression name -> (function to open the file in binary mode, file suffix)
+COMPRESSIONS = {
+    None: (open, ''),
+    'gzip': (gzip.open, '.gz'),
+    'lzma': (lzma.open, '.xz'),
+    'bz2': (bz2.open, '.bz2'),
+}
+
+PARTITION_FIELDS = ('Date', 'Region')
+
+# rows formatted into one block before it is handed to a writer thread
+BLOCK_ROWS = 10_000
+
+# threads compressing and writing blocks - zlib, lzma and bz2 release the GIL while they compress
+WRITER_THREADS = 4
+
+MANIFEST_FILE = 'manifest.json'
+
+
+# --------------- ENRICHED DATA WRITER ---------------
+
+# Writes enriched rows as pipe-delimited text (same format as csv.DictWriter with the default dialect)
+# Rows are formatted in blocks of BLOCK_ROWS with the C csv writer and each block is compressed and written in one call
+# on a writer thread, so formatting the next block overlaps with compressing and writing the previous one
+# With partition_by ('Date' or 'Region') every value gets its own file in a directory, with a manifest of row counts;
+# blocks for different partitions are written in parallel, blocks of one partition stay in order
+# Compressed blocks are appended as separate gzip / xz / bz2 members, which the standard readers decompress as one stream
+class EnrichedDataWriter:
+    def __init__(self, output_path, compression=None, partition_by=None, append=False, workers=WRITER_THREADS):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {compression} - expected one of {[name for name in COMPRESSIONS if name]}")
+        if partition_by is not None and partition_by not in PARTITION_FIELDS:
+            raise ValueError(f"cannot partition by {partition_by} - expected one of {PARTITION_FIELDS}")
+
+        self.compression = compression
+        self.partition_by = partition_by
+        self.append = append
+        self.opener, self.suffix = COMPRESSIONS[compression]
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers if partition_by else 1))
+
+        output_path = Path(output_path)
+        if partition_by is None:
+            self.output_path = output_path.with_name(output_path.name + self.suffix)
+        else:
+            # e.g. data/enriched_sales_data.txt -> data/enriched_sales_data_by_region/
+            self.output_path = output_path.with_name(f"{output_path.stem}_by_{partition_by.lower()}")
+            self.output_path.mkdir(parents=True, exist_ok=True)
+
+        # partition value (None when not partitioned) -> {'file', 'rows'}
+        self.partitions = {}
+        if partition_by is not None:
+            previous = self._load_manifest()
+            if append:
+                self.partitions = previous
+            else:
+                # partitions from an earlier run are removed so the directory matches the new manifest
+                for partition in previous.values():
+                    (self.output_path / partition['file']).unlink(missing_ok=True)
+        self._buffers = {}
+        self._pending = {}
+        self._started = set()
+
+    def _load_manifest(self):
+        try:
+            with open(self.output_path / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get('compression') != self.compression:
+            return {}
+        return manifest['partitions']
+
+    def _partition_path(self, value):
+        if self.partition_by is None:
+            return self.output_path
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', value).strip('_') or '_empty'
+        return self.output_path / f"{name}.txt{self.suffix}"
+
+    # adds rows (enriched records read like dictionaries) - returns the number of rows written
+    def write(self, enriched_transactions):
+        count = 0
+        for record in enriched_transactions:
+            row = [record[field] for field in ENRICHED_FIELDS]
+            key = record[self.partition_by] if self.partition_by else None
+
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = []
+            buffer.append(row)
+            if len(buffer) >= BLOCK_ROWS:
+                self._submit(key)
+            count += 1
+
+        return count
+
+    # formats a partition's buffered rows and queues them for writing after the partition's previous block
+    def _submit(self, key):
+        rows = self._buffers.pop(key)
+
+        if key not in self.partitions:
+            self.partitions[key] = {'file': self._partition_path(key).name, 'rows': 0}
+        self.partitions[key]['rows'] += len(rows)
+
+        path = self._partition_path(key)
+        write_header = key not in self._started and not (self.append and path.exists() and path.stat().st_size > 0)
+        if key not in self._started and not self.append and path.exists():
+            path.unlink()
+        self._started.add(key)
+
+        text = io.StringIO()
+        writer = csv.writer(text, delimiter='|')
+        if write_header:
+            writer.writerow(ENRICHED_FIELDS)
+        writer.writerows(rows)
+        block = text.getvalue().encode('utf-8')
+
+        previous = self._pending.get(key)
+        if previous is not None:
+            previous.result()
+        self._pending[key] = self.executor.submit(self._write_block, path, block)
+
+    def _write_block(self, path, block):
+        with self.opener(path, 'ab') as f:
+            f.write(block)
+
+    # writes the remaining rows, waits for every block and saves the manifest - returns the output path
+    def close(self):
+        for key in list(self._buffers):
+            self._submit(key)
+
+        # an empty unpartitioned output still gets its header row
+        if self.partition_by is None and None not in self._started:
+            self._buffers[None] = []
+            self._submit(None)
+
+        for future in self._pending.values():
+            future.result()
+        self.executor.shutdown()
+
+        if self.partition_by is not None:
+            self._save_manifest()
+        return self.output_path
+
+    def _save_manifest(self):
+        manifest = {
+            'partition_by': self.partition_by,
+            'compression': self.compression,
+            'columns': list(ENRICHED_FIELDS),
+            'total_rows': sum(partition['rows'] for partition in self.partitions.values()),
+            'partitions': dict(sorted(self.partitions.items())),
+        }
+
+        temp_path = self.output_path / (MANIFEST_FILE + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.output_path / MANIFEST_FILE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.executor.shutdown()
@@ -1,104 +1,345 @@
+from contextlib import contextmanager
+from datetime import date as calendar_date
+from functools import lru_cache
 from pathlib import Path
+from sys import intern
 
-# function to read sales data with encoding handling
-def read_sales_data(filename):
+from utils.money import parse_paise, to_rupees
+from utils.records import Transaction, TRANSACTION_FIELDS
+
+# encodings tried in order - latin-1 can decode any byte, so it always succeeds as a fallback
+ENCODINGS = ['utf-8', 'latin-1', 'cp1252']
+
+# number of bytes read from the start of the file to detect its encoding
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+
+# function to resolve a file name inside the data folder
+def get_data_path(filename):
     current_path = Path(__file__)
     base_path = current_path.parent.parent
-    data_path = base_path/"data"/filename
+    return base_path/"data"/filename
 
-    # handle FileNotFoundError
-    if not data_path.exists():
-        print(f"Error: The file {filename} was not found.")
-        return []
 
-    # try different encodings - file will be read with the first one that succeeds
-    encodings_list = ['utf-8','latin-1','cp1252']
+# function to detect the file encoding once from a leading sample of the file
+def detect_encoding(data_path, sample_size=ENCODING_SAMPLE_SIZE):
+    with open(data_path, "rb") as f:
+        sample = f.read(sample_size)
 
-    for enc in encodings_list:
+    # the sample may end in the middle of a multi-byte character - trim it to the last complete line
+    if len(sample) == sample_size and b"\n" in sample:
+        sample = sample[:sample.rindex(b"\n")]
+
+    for enc in ENCODINGS:
         try:
-            data_list = []
-            with open(data_path, "r", encoding=enc) as f:
-                # 'next' returns the next item from an iterator. A file opened with 'open' (here, 'f') is an iterator
-                # this line reads and skips the header row, file pointer moves to the second line - the loop below starts from the second line
-                # returns None if file is empty
-                next(f, None)
-                
-                for line in f:
-                    # skip the empty lines
-                    # strip removes leading/trailing spaces and newline characters
-                    # If a line only contained these, strip() returns an empty string "" - empty string evaluates to false
-                    cleaned_line = line.strip()
-                    if cleaned_line:
-                        data_list.append(cleaned_line)
-
-            # returns a list of raw lines (strings)
-            return data_list
-        
-        # handle encoding issues
+            sample.decode(enc)
+            return enc
         except UnicodeDecodeError:
             print(f"Error: Failed to read file with: {enc}.")
             continue
-    return []
+    return ENCODINGS[-1]
+
+
+# function to decode one line - lines that fail with the detected encoding fall back to the next encodings
+def decode_line(raw_line, encoding):
+    try:
+        return raw_line.decode(encoding)
+    except UnicodeDecodeError:
+        for enc in ENCODINGS:
+            try:
+                return raw_line.decode(enc)
+            except UnicodeDecodeError:
+                continue
+    return raw_line.decode(ENCODINGS[-1], errors="replace")
+
+
+# function to stream sales data line by line - memory use does not grow with the file size
+def iter_sales_data(filename):
+    for _, cleaned_line in iter_numbered_sales_data(filename):
+        yield cleaned_line
+
+
+# function to stream sales data as (line number in the file, cleaned line) - the header is line 1
+def iter_numbered_sales_data(filename):
+    data_path = get_data_path(filename)
+
+    # handle FileNotFoundError
+    if not data_path.exists():
+        print(f"Error: The file {filename} was not found.")
+        return
+
+    # encoding is detected once, a late bad line is decoded on its own instead of re-reading the file
+    encoding = detect_encoding(data_path)
+
+    with open(data_path, "rb") as f:
+        # skip the header row, returns None if file is empty
+        next(f, None)
+
+        for line_number, line in enumerate(f, start=2):
+            # skip the empty lines
+            # strip removes leading/trailing spaces and newline characters
+            cleaned_line = decode_line(line, encoding).strip()
+            if cleaned_line:
+                yield line_number, cleaned_line
+
+
+# function to stream the complete lines that come after a byte offset (used to process only appended data)
+# position['offset'] is moved past every complete line read, a partial last line is left for the next read
+# deliberately - it may still be being written - so a file whose last row has no newline yields that row only
+# once the newline is there; full reads (iter_sales_data) do include it
+def iter_sales_data_from(data_path, offset, encoding, position):
+    with open(data_path, "rb") as f:
+        yield from iter_lines_from_handle(f, offset, encoding, position)
+
+
+# same as iter_sales_data_from for a file that is already open (e.g. kept open to follow it through a rotation)
+def iter_lines_from_handle(f, offset, encoding, position):
+    position['offset'] = offset
+    f.seek(offset)
+
+    # at the start of the file the header row is skipped
+    if offset == 0:
+        header = f.readline()
+        if not header.endswith(b"\n"):
+            return
+        position['offset'] = f.tell()
+
+    for line in f:
+        # a line without a newline is still being written
+        if not line.endswith(b"\n"):
+            break
+
+        position['offset'] += len(line)
+        cleaned_line = decode_line(line, encoding).strip()
+        if cleaned_line:
+            yield cleaned_line
+
+
+# function to read sales data with encoding handling
+def read_sales_data(filename):
+    # returns a list of raw lines (strings)
+    return list(iter_sales_data(filename))
+
+
+# reason codes for rejected rows - the first two come from parsing, the rest from the validation rules
+REJECT_REASONS = ('field_count', 'bad_number', 'missing_field', 'non_positive', 'bad_id_prefix', 'bad_date')
+
+
+# function to parse one raw line - returns (Transaction, None), or (None, reason code) if the line cannot be parsed
+def parse_line(raw_line, field_count=len(TRANSACTION_FIELDS)):
+    values = raw_line.split('|')
+
+    # rows with incorrect number of fields
+    if len(values) != field_count:
+        return None, 'field_count'
+
+    transaction_id, date, product_id, product_name, quantity, unit_price, customer_id, region = values
+
+    # handle commas within ProductName - replace with space
+    product_name = product_name.replace(',', ' ').strip()
+
+    try:
+        # Quantity -> Remove commas and convert to int
+        quantity = int(quantity.replace(',','').strip())
+
+        # UnitPrice -> Remove commas and convert to exact paise (the float rupee value is kept for display and filters)
+        price_paise = parse_paise(unit_price)
+    except ValueError:
+        return None, 'bad_number'
+
+    # repeated values (dates, products, customers, regions) are interned so every row shares one string object
+    record = Transaction(
+        transaction_id,
+        intern(date),
+        intern(product_id),
+        intern(product_name),
+        quantity,
+        to_rupees(price_paise),
+        intern(customer_id),
+        intern(region),
+        price_paise
+    )
+    return record, None
+
+
+# function to parse raw lines one at a time and handle data quality issues
+def iter_transactions(raw_lines):
+    for raw_line in raw_lines:
+        # skip rows with incorrect number of fields or numbers that cannot be converted
+        record, _ = parse_line(raw_line)
+        if record is not None:
+            yield record
 
 
 # function to parse raw data and handle data quality issues
 def parse_transactions(raw_lines):
-    keys = ['TransactionID', 'Date', 'ProductID', 'ProductName','Quantity', 'UnitPrice', 'CustomerID', 'Region']
-    clean_data_list = []
+    # returns a clean list of Transaction records (read like dictionaries)
+    return list(iter_transactions(raw_lines))
 
-    for raw_line in raw_lines:
-        values = raw_line.split('|')
 
-        # skip rows with incorrect number of fields
-        if len(values) != len(keys):
-            continue
+REQUIRED_FIELDS = TRANSACTION_FIELDS
 
-        # map keys to values to form a dictionary for a transaction record
-        record = dict(zip(keys,values))
 
-        # handle commas within ProductName - replace with space
-        record['ProductName'] = record['ProductName'].replace(',', ' ').strip()
+# function to check the validation rules for a single transaction - returns the reason code of the first rule
+# the transaction breaks, or None if it is valid
+def check_transaction(record):
+    # validates if all required fields are present
+    if any(record[field] == '' for field in REQUIRED_FIELDS):
+        return 'missing_field'
 
-        try:
-            # Quantity -> Remove commas and convert to int
-            record['Quantity'] = int(record['Quantity'].replace(',','').strip())
+    # validates if quantity and unit price values are greater than 0
+    if record['Quantity'] <= 0 or record['UnitPrice'] <= 0:
+        return 'non_positive'
+
+    # validates if TransactionID starts with 'T', ProductID starts with 'P' and CustomerID starts with 'C'
+    if not (record['TransactionID'].startswith('T') and record['ProductID'].startswith('P') and record['CustomerID'].startswith('C')):
+        return 'bad_id_prefix'
+
+    # validates if Date is an ISO calendar date - date ranges, the time index and weekly periods rely on it
+    if not is_iso_date(record['Date']):
+        return 'bad_date'
+
+    return None
+
+
+# function to check a date is a valid calendar date written as YYYY-MM-DD
+# cached - a sales file has few distinct dates
+@lru_cache(maxsize=4096)
+def is_iso_date(text):
+    if len(text) != 10 or text[4] != '-' or text[7] != '-':
+        return False
+    try:
+        calendar_date.fromisoformat(text)
+    except ValueError:
+        return False
+    return True
+
+
+# function to check the validation rules for a single transaction
+def is_valid_transaction(record):
+    return check_transaction(record) is None
+
+
+# function to create an empty filter summary - the counters are updated as transactions are processed
+def new_filter_summary():
+    return {
+        'total_input': 0,
+        'invalid': 0,
+        'duplicates': 0,
+        'filtered_by_region': 0,
+        'filtered_by_amount': 0,
+        'final_count': 0
+    }
+
+
+# function to create empty reject counters - one per reason code
+def new_reject_summary():
+    return {reason: 0 for reason in REJECT_REASONS}
+
+
+# function to write rejected rows to a quarantine file while a stream runs
+# yields a function quarantine(line_number, reason, raw_line) that appends one pipe-delimited row
+@contextmanager
+def open_quarantine(filename='data/rejected_rows.txt'):
+    quarantine_path = Path(__file__).parent.parent / filename
+    quarantine_path.parent.mkdir(parents=True, exist_ok=True)
 
-            # UnitPrice -> Remove commas and convert to float
-            record['UnitPrice'] = float(record['UnitPrice'].replace(',','').strip())
-        except ValueError:
+    with open(quarantine_path, 'w', encoding='utf-8') as f:
+        f.write("LineNumber|Reason|RawLine\n")
+
+        def quarantine(line_number, reason, raw_line):
+            f.write(f"{line_number}|{reason}|{raw_line}\n")
+
+        yield quarantine
+
+
+# function to parse and validate numbered lines in one step - each row is split, cleaned, converted and checked once
+# total_input / invalid are counted in filter_summary the same way as parse_transactions + validate_and_filter count them
+# (rows that cannot be parsed are not part of total_input), every rejected row is counted in reject_summary by reason
+# and passed to quarantine(line_number, reason, raw_line) if given
+def iter_checked_transactions(numbered_lines, filter_summary=None, reject_summary=None, quarantine=None):
+    for line_number, raw_line in numbered_lines:
+        record, reason = parse_line(raw_line)
+
+        if record is not None:
+            reason = check_transaction(record)
+            if filter_summary is not None:
+                filter_summary['total_input'] += 1
+                if reason is not None:
+                    filter_summary['invalid'] += 1
+
+        if reason is None:
+            yield record
             continue
 
-        clean_data_list.append(record)
+        if reject_summary is not None:
+            reject_summary[reason] += 1
+        if quarantine is not None:
+            quarantine(line_number, reason, raw_line)
 
-    # returns a clean list of dictionaries 
-    return clean_data_list
 
+# function to validate and filter transactions one at a time
+# counts are added to filter_summary as rows stream through, so it is complete once the generator is exhausted
+# validated=True is for rows from iter_checked_transactions - they are not checked or counted as input again
+# with seen_ids (see utils/dedup.py) a valid row whose TransactionID was already seen is counted as a duplicate and dropped
+def iter_valid_transactions(transactions, region=None, min_amount=None, max_amount=None, filter_summary=None, validated=False,
+                            seen_ids=None):
+    if filter_summary is None:
+        filter_summary = new_filter_summary()
 
-# function to validate and filter transactions
-def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None):
-    valid_transactions = []
-    invalid_count = 0
-    required_fields = ['TransactionID', 'Date', 'ProductID', 'ProductName', 'Quantity', 'UnitPrice', 'CustomerID', 'Region']
+    region_normalized = region.strip().lower() if region else None
+    min_amount = float(min_amount) if min_amount is not None else None
+    max_amount = float(max_amount) if max_amount is not None else None
 
-    # ------ VALIDATION ------
-    
     for record in transactions:
-        # validates if all required fields are present
-        if any(record[field] == '' for field in required_fields):
-            invalid_count += 1
+        if not validated:
+            filter_summary['total_input'] += 1
+
+            if not is_valid_transaction(record):
+                filter_summary['invalid'] += 1
+                continue
+
+        # replayed rows are dropped before the filters, so a duplicate is counted whatever its region or amount
+        if seen_ids is not None and not seen_ids.add(record['TransactionID']):
+            filter_summary['duplicates'] += 1
             continue
 
-        # validates if quantity and unit price values are greater than 0
-        if record['Quantity'] <= 0 or record['UnitPrice'] <= 0:
-            invalid_count += 1
+        # filtering by region
+        if region_normalized and record['Region'].strip().lower() != region_normalized:
+            filter_summary['filtered_by_region'] += 1
             continue
 
-        # validates if TransactionID starts with 'T', ProductID starts with 'P' and CustomerID starts with 'C'
-        if not (record['TransactionID'].startswith('T') and record['ProductID'].startswith('P') and record['CustomerID'].startswith('C')):
-            invalid_count += 1
+        # filtering by minimum and maximum transaction amount
+        amount = record['Quantity'] * record['UnitPrice']
+        if (min_amount is not None and amount < min_amount) or (max_amount is not None and amount > max_amount):
+            filter_summary['filtered_by_amount'] += 1
             continue
 
-        valid_transactions.append(record)
+        filter_summary['final_count'] += 1
+        yield record
+
+
+# function to validate and filter transactions
+# with seen_ids (see utils/dedup.py) valid rows with an already seen TransactionID are dropped and counted as duplicates
+def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None, seen_ids=None):
+    # ------ VALIDATION ------
+
+    # duplicates are checked in the same loop as validation - the first valid occurrence of an ID is kept
+    if seen_ids is None:
+        valid_transactions = [record for record in transactions if is_valid_transaction(record)]
+        invalid_count = len(transactions) - len(valid_transactions)
+        duplicate_count = 0
+    else:
+        valid_transactions = []
+        invalid_count = 0
+        duplicate_count = 0
+        for record in transactions:
+            if not is_valid_transaction(record):
+                invalid_count += 1
+            elif not seen_ids.add(record['TransactionID']):
+                duplicate_count += 1
+            else:
+                valid_transactions.append(record)
 
     # ------ FILTER DISPLAY ------
     
@@ -113,37 +354,47 @@ def validate_and_filter(transactions, region=None, min_amount=None, max_amount=N
 
     # ------ FILTERING ------
 
+    # single pass - each row's amount (computed once above) and normalized region are reused by every filter
+    # a row is counted against the first filter it fails, in the order region -> min amount -> max amount
+    region_normalized = region.strip().lower() if region else None
+    min_value = float(min_amount) if min_amount is not None else None
+    max_value = float(max_amount) if max_amount is not None else None
+
+    filtered = []
     filtered_by_region = 0
-    filtered_by_amount = 0
-    filtered = valid_transactions
-    
-    # filtering by region
+    filtered_by_min = 0
+    filtered_by_max = 0
+
+    for record, amount in zip(valid_transactions, amounts):
+        if region_normalized and record['Region'].strip().lower() != region_normalized:
+            filtered_by_region += 1
+        elif min_value is not None and amount < min_value:
+            filtered_by_min += 1
+        elif max_value is not None and amount > max_value:
+            filtered_by_max += 1
+        else:
+            filtered.append(record)
+
+    filtered_by_amount = filtered_by_min + filtered_by_max
+
+    remaining = len(valid_transactions) - filtered_by_region
     if region:
-        before = len(filtered)
-        region_normalized = region.strip().lower()
-        filtered = [record for record in filtered if record['Region'].strip().lower() == region_normalized]
-        filtered_by_region = before - len(filtered)
-        print(f"Count of records after applying region filter ({region}): {len(filtered)}")
+        print(f"Count of records after applying region filter ({region}): {remaining}")
 
-    # filtering by minimum transaction amount
+    remaining -= filtered_by_min
     if min_amount is not None:
-        before = len(filtered)
-        filtered = [record for record in filtered if record['Quantity'] * record['UnitPrice'] >= float(min_amount)]
-        filtered_by_amount += before - len(filtered)
-        print(f"Count of records after applying min amount filter ({min_amount}): {len(filtered)}")
+        print(f"Count of records after applying min amount filter ({min_amount}): {remaining}")
 
-    # filtering by maximum transaction amount
+    remaining -= filtered_by_max
     if max_amount is not None:
-        before = len(filtered)
-        filtered = [record for record in filtered if record['Quantity'] * record['UnitPrice'] <= float(max_amount)]
-        filtered_by_amount += before - len(filtered)
-        print(f"Count of records after applying max amount filter ({max_amount}): {len(filtered)}")
+        print(f"Count of records after applying max amount filter ({max_amount}): {remaining}")
 
     # ------ SUMMARY ------
 
     filter_summary = {
         'total_input': len(transactions),
         'invalid': invalid_count,
+        'duplicates': duplicate_count,
         'filtered_by_region': filtered_by_region,
         'filtered_by_amount': filtered_by_amount,
         'final_count': len(filtered)
@@ -0,0 +1,70 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# paise per rupee - money is held as an integer number of paise so sums are exact and independent of order
+PAISE_PER_RUPEE = 100
+
+_ONE_PAISA = Decimal('0.01')
+
+
+# --------------- FIXED-POINT MONEY (INTEGER PAISE) ---------------
+
+# function to parse a price such as "1,299.5" to an exact number of paise
+# prices with more than two decimals are rounded half up to the nearest paisa; anything that is not a finite
+# number raises ValueError
+def parse_paise(text):
+    text = text.replace(',', '').strip()
+
+    # fast path - plain integers and prices with one or two decimals need no Decimal
+    rupees, _, fraction = text.partition('.')
+    digits = rupees.lstrip('+-')
+    if digits.isdigit() and len(rupees) - len(digits) <= 1 and len(fraction) <= 2 and (fraction.isdigit() or not fraction):
+        paise = int(digits) * PAISE_PER_RUPEE + int(fraction.ljust(2, '0'))
+        return -paise if rupees.startswith('-') else paise
+
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"could not convert string to money: {text!r}") from None
+    if not value.is_finite():
+        raise ValueError(f"could not convert string to money: {text!r}")
+    return int(value.quantize(_ONE_PAISA, rounding=ROUND_HALF_UP) * PAISE_PER_RUPEE)
+
+
+# function to convert a rupee amount held as a float (or int) to paise
+# the float's shortest representation is used, so 0.29 becomes 29 paise and not 28.999999999999996
+def paise_from_float(value):
+    if isinstance(value, int):
+        return value * PAISE_PER_RUPEE
+
+    scaled = value * PAISE_PER_RUPEE
+    paise = round(scaled)
+    if abs(scaled - paise) < 1e-6:
+        return paise
+    return int(Decimal(repr(value)).quantize(_ONE_PAISA, rounding=ROUND_HALF_UP) * PAISE_PER_RUPEE)
+
+
+# function to get a record's exact UnitPrice in paise - parsed Transactions carry it, plain dictionaries are converted
+def unit_price_paise(record):
+    try:
+        return record.price_paise
+    except AttributeError:
+        return paise_from_float(record['UnitPrice'])
+
+
+# function to convert paise to rupees - the float closest to the exact amount
+def to_rupees(paise):
+    return paise / PAISE_PER_RUPEE
+
+
+# function to divide a paise total by a count, rounded half up to the nearest paisa (e.g. an average order value)
+def average_paise(total_paise, count):
+    if count <= 0:
+        return 0
+    return (2 * total_paise + count) // (2 * count)
+
+
+# function to format paise as Indian rupees with thousands separators, e.g. ₹1,234.50
+def format_paise(paise):
+    sign = '-' if paise < 0 else ''
+    rupees, paise = divmod(abs(paise), PAISE_PER_RUPEE)
+    return f"₹{sign}{rupees:,}.{paise:02d}"
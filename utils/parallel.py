@@ -0,0 +1,120 @@
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.file_handler import (
+    get_data_path,
+    detect_encoding,
+    decode_line,
+    iter_transactions,
+    iter_valid_transactions,
+    new_filter_summary
+)
+from utils.data_processor import SalesAggregates, aggregate_stream
+from utils.api_handler import iter_enriched_sales_data
+
+# files smaller than this are processed in the current process - starting workers would cost more than parsing
+MIN_PARALLEL_BYTES = 4 * 1024 * 1024
+
+
+# function to split a file into byte ranges aligned to line boundaries (the header line is skipped)
+def find_chunk_ranges(data_path, chunk_count):
+    size = os.path.getsize(data_path)
+    if size == 0:
+        return []
+
+    with open(data_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # data starts after the header row
+        header_end = mm.find(b'\n')
+        if header_end == -1:
+            return []
+        start = header_end + 1
+
+        ranges = []
+        chunk_size = max(1, (size - start) // max(1, chunk_count))
+
+        while start < size:
+            end = min(size, start + chunk_size)
+            # move the boundary to the end of the current line so no line is split between chunks
+            if end < size:
+                newline = mm.find(b'\n', end - 1)
+                end = size if newline == -1 else newline + 1
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+# function to parse, validate and aggregate one byte range of the file (runs in a worker process)
+# with a product mapping the valid rows are also counted for enrichment ({'total', 'matched'}, None otherwise)
+def _process_chunk(task):
+    data_path, start, end, encoding, region, min_amount, max_amount, keep_transactions, product_mapping, distinct_precision = task
+
+    with open(data_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        chunk = mm[start:end]
+
+    # same line cleaning as iter_sales_data
+    raw_lines = (decode_line(line, encoding).strip() for line in chunk.split(b'\n'))
+    raw_lines = (line for line in raw_lines if line)
+
+    filter_summary = new_filter_summary()
+    aggregates = SalesAggregates(distinct_precision)
+    valid_txns = iter_valid_transactions(iter_transactions(raw_lines), region, min_amount, max_amount, filter_summary)
+    valid_txns = aggregate_stream(valid_txns, aggregates)
+
+    enrichment = None
+    if product_mapping is not None:
+        enrichment = {'total': 0, 'matched': 0}
+        valid_txns = (enriched.record for enriched in iter_enriched_sales_data(valid_txns, product_mapping, enrichment))
+
+    if keep_transactions:
+        transactions = list(valid_txns)
+    else:
+        transactions = None
+        for _ in valid_txns:
+            pass
+
+    return filter_summary, aggregates, transactions, enrichment
+
+
+# function to ingest a sales data file on several cores
+# returns the same (transactions, invalid_count, filter_summary) as validate_and_filter, plus the merged aggregates
+def parallel_ingest(filename, workers=None, region=None, min_amount=None, max_amount=None, keep_transactions=True):
+    data_path = get_data_path(filename)
+
+    # handle FileNotFoundError
+    if not data_path.exists():
+        print(f"Error: The file {filename} was not found.")
+        return [], 0, new_filter_summary(), SalesAggregates()
+
+    workers = workers or os.cpu_count() or 1
+    if os.path.getsize(data_path) < MIN_PARALLEL_BYTES:
+        workers = 1
+
+    encoding = detect_encoding(data_path)
+    tasks = [
+        (str(data_path), start, end, encoding, region, min_amount, max_amount, keep_transactions, None, None)
+        for start, end in find_chunk_ranges(data_path, workers)
+    ]
+
+    if workers == 1:
+        results = [_process_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map keeps the chunk order, so merged results follow the file order
+            results = list(pool.map(_process_chunk, tasks))
+
+    # ------ MERGE PARTIAL RESULTS ------
+
+    filter_summary = new_filter_summary()
+    aggregates = SalesAggregates()
+    transactions = [] if keep_transactions else None
+
+    for chunk_summary, chunk_aggregates, chunk_transactions, _ in results:
+        for key, count in chunk_summary.items():
+            filter_summary[key] += count
+        aggregates.merge(chunk_aggregates)
+        if keep_transactions:
+            transactions.extend(chunk_transactions)
+
+    return transactions, filter_summary['invalid'], filter_summary, aggregates
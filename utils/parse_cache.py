@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from utils.file_handler import get_data_path, iter_sales_data
+from utils.columnar import TransactionTable, STRING_COLUMNS, ID_COLUMNS
+
+PARSE_CACHE_DIR = 'data/.parse_cache'
+CACHE_FORMAT_VERSION = 4
+
+# bytes read per block while hashing the data file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+# --------------- PARSED DATA CACHE ---------------
+
+# Parsed columns are stored as .npy files in a folder named after the data file's content hash
+# An index maps each data file's (size, mtime) to its hash, so an unchanged file is recognised without reading it
+# meta.json only holds the format version and row count - category lists are stored as UTF-8 byte arrays
+
+# function to resolve a path relative to the project folder
+def _project_path(path):
+    return Path(__file__).parent.parent / path
+
+
+# function to hash the full content of a file
+def hash_file(data_path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(data_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# function to get the size and modification time of a file
+def file_fingerprint(data_path):
+    stat = os.stat(data_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _load_index(cache_dir):
+    try:
+        with open(cache_dir / 'index.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(cache_dir, index):
+    temp_path = cache_dir / f'index.json.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(temp_path, cache_dir / 'index.json')
+
+
+# function to write a table's columns into a cache folder
+def save_table(table, table_dir):
+    table_dir = Path(table_dir)
+    temp_dir = table_dir.with_name(f"{table_dir.name}.{os.getpid()}.tmp")
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    np.save(temp_dir / 'Quantity.npy', table.quantity)
+    np.save(temp_dir / 'price_paise.npy', table.price_paise)
+    np.save(temp_dir / 'amount.npy', table.amount)
+    for name in STRING_COLUMNS:
+        np.save(temp_dir / f'{name}.codes.npy', table.codes[name])
+        categories = [value.encode('utf-8') for value in table.categories[name]]
+        np.save(temp_dir / f'{name}.categories.npy', np.array(categories, dtype=bytes) if categories else np.array([], dtype='S1'))
+    for name in ID_COLUMNS:
+        np.save(temp_dir / f'{name}.npy', table.ids[name])
+
+    with open(temp_dir / 'meta.json', 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_FORMAT_VERSION, 'rows': len(table)}, f)
+
+    # the folder is renamed into place, a reader never sees a partly written cache
+    try:
+        os.replace(temp_dir, table_dir)
+    except OSError:
+        # another process already stored the same content
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+# function to load a cached table - numeric and code columns are memory-mapped, nothing is copied or parsed
+# returns None if the folder is missing or was written by another cache version
+def load_table(table_dir):
+    table_dir = Path(table_dir)
+    try:
+        with open(table_dir / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('version') != CACHE_FORMAT_VERSION:
+        return None
+
+    codes = {name: np.load(table_dir / f'{name}.codes.npy', mmap_mode='r') for name in STRING_COLUMNS}
+    categories = {
+        name: [value.decode('utf-8') for value in np.load(table_dir / f'{name}.categories.npy').tolist()]
+        for name in STRING_COLUMNS
+    }
+    ids = {name: np.load(table_dir / f'{name}.npy', mmap_mode='r') for name in ID_COLUMNS}
+    return TransactionTable(
+        codes,
+        categories,
+        ids,
+        np.load(table_dir / 'Quantity.npy', mmap_mode='r'),
+        np.load(table_dir / 'price_paise.npy', mmap_mode='r'),
+        amount=np.load(table_dir / 'amount.npy', mmap_mode='r'),
+    )
+
+
+# function to get the parsed transactions of a sales data file as a TransactionTable, using the cache when possible
+# the file is only parsed when its content has not been seen before
+# returns (table, True on a cache hit)
+def load_parsed_table(filename, cache_dir=PARSE_CACHE_DIR):
+    data_path = get_data_path(filename)
+    cache_dir = _project_path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    index = _load_index(cache_dir)
+    fingerprint = file_fingerprint(data_path)
+    entry = index.get(str(data_path))
+
+    # same size and mtime - the content hash from the index is trusted, the file is not read
+    if entry and entry['size'] == fingerprint['size'] and entry['mtime_ns'] == fingerprint['mtime_ns']:
+        content_hash = entry['hash']
+    else:
+        content_hash = hash_file(data_path)
+
+    table_dir = cache_dir / content_hash
+    table = load_table(table_dir)
+    hit = table is not None
+
+    if not hit:
+        table = TransactionTable.from_lines(iter_sales_data(filename))
+        save_table(table, table_dir)
+
+    if entry is None or entry.get('hash') != content_hash or entry['mtime_ns'] != fingerprint['mtime_ns']:
+        index[str(data_path)] = {**fingerprint, 'hash': content_hash}
+        _save_index(cache_dir, index)
+
+    return table, hit
@@ -0,0 +1,141 @@
+import cProfile
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+# --------------- PIPELINE INSTRUMENTATION ---------------
+
+# Records wall time, CPU time, rows in/out, rows per second and (optionally) tracemalloc peak memory per stage
+# Stages can be nested - e.g. the data_processor functions called while the report is generated
+class PipelineProfiler:
+    def __init__(self, track_memory=False, cprofile_stage=None, cprofile_dir='output'):
+        self.track_memory = track_memory
+        self.cprofile_stage = cprofile_stage
+        self.cprofile_dir = cprofile_dir
+        self.started_at = datetime.now()
+        self.stages = []
+        self._stack = []
+        self._started = 0
+
+    def start(self):
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return self
+
+    def stop(self):
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # context manager around one stage - set stats['rows_out'] (and rows_in if not known up front) inside the block
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        stats = {'name': name, 'order': self._started, 'depth': len(self._stack), 'rows_in': rows_in, 'rows_out': None}
+        self._started += 1
+        frame = {'peak': 0}
+
+        if self.track_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # the parent's peak so far is saved before the counter is reset for this stage
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start_memory'] = current
+
+        profiler = None
+        if self.cprofile_stage == name:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        self._stack.append(frame)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        try:
+            yield stats
+        finally:
+            stats['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            stats['cpu_seconds'] = round(time.process_time() - cpu_start, 6)
+            self._stack.pop()
+
+            if profiler is not None:
+                profiler.disable()
+                Path(self.cprofile_dir).mkdir(parents=True, exist_ok=True)
+                dump_path = Path(self.cprofile_dir) / f"profile_{name}.prof"
+                profiler.dump_stats(dump_path)
+                stats['cprofile_dump'] = str(dump_path)
+
+            if 'start_memory' in frame:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                stats['peak_memory_bytes'] = peak - frame['start_memory']
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+
+            rows = stats['rows_out'] if stats['rows_out'] is not None else stats['rows_in']
+            if rows is not None and stats['wall_seconds'] > 0:
+                stats['rows_per_second'] = round(rows / stats['wall_seconds'], 1)
+
+            self.stages.append(stats)
+
+    # stages in the order they started (nested stages finish first, so they are sorted back)
+    def to_dict(self):
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'track_memory': self.track_memory,
+            'total_wall_seconds': round(sum(stage['wall_seconds'] for stage in self.stages if stage['depth'] == 0), 6),
+            'stages': sorted(self.stages, key=lambda stage: stage['order']),
+        }
+
+    # writes the run profile as JSON
+    def save(self, output_file):
+        output_path = Path(output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return output_path
+
+
+# profiler that the @profiled functions report to - None when no run is being profiled
+_active_profiler = None
+
+
+# function to make a profiler the one that @profiled functions report to
+def set_active_profiler(profiler):
+    global _active_profiler
+    _active_profiler = profiler
+
+
+# function to get the profiler that @profiled functions report to
+def get_active_profiler():
+    return _active_profiler
+
+
+# decorator that records a function as a stage of the active profiler
+# rows_in is the length of the first argument (or its record_count for prebuilt aggregates)
+def profiled(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active_profiler
+        if profiler is None:
+            return func(*args, **kwargs)
+
+        rows_in = None
+        if args:
+            data = args[0]
+            rows_in = getattr(data, 'record_count', None)
+            if rows_in is None and hasattr(data, '__len__'):
+                rows_in = len(data)
+
+        with profiler.stage(func.__name__, rows_in=rows_in) as stats:
+            result = func(*args, **kwargs)
+            if isinstance(result, (list, dict)):
+                stats['rows_out'] = len(result)
+            return result
+
+    return wrapper
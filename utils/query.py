@@ -0,0 +1,125 @@
+from bisect import bisect_left, bisect_right
+
+from utils.file_handler import is_valid_transaction
+
+
+# --------------- INDEXED TRANSACTION QUERIES ---------------
+
+# Index over the valid transactions for repeated region / amount range queries
+# Built once: every row is validated, its amount computed and its region normalized a single time
+# A query is then a dictionary lookup plus two bisects, instead of a scan over all transactions
+class TransactionIndex:
+    def __init__(self, transactions):
+        self.transactions = []
+        self.amounts = []
+        self.total_input = 0
+        self.invalid_count = 0
+
+        region_rows = {}
+        for record in transactions:
+            self.total_input += 1
+            if not is_valid_transaction(record):
+                self.invalid_count += 1
+                continue
+
+            position = len(self.transactions)
+            self.transactions.append(record)
+            self.amounts.append(record['Quantity'] * record['UnitPrice'])
+            region_rows.setdefault(record['Region'].strip().lower(), []).append(position)
+
+        # posting lists sorted by amount: (sorted amounts, matching row positions)
+        self.all_rows = self._sorted_by_amount(range(len(self.transactions)))
+        self.region_rows = {region: self._sorted_by_amount(rows) for region, rows in region_rows.items()}
+
+    # adds more transactions (e.g. lines appended to the source file) to the index
+    # the new rows are sorted once per posting list and merged into it in one linear pass,
+    # the existing rows are not re-sorted
+    def extend(self, transactions):
+        new_rows = []
+        new_region_rows = {}
+        for record in transactions:
+            self.total_input += 1
+            if not is_valid_transaction(record):
+                self.invalid_count += 1
+                continue
+
+            position = len(self.transactions)
+            self.transactions.append(record)
+            self.amounts.append(record['Quantity'] * record['UnitPrice'])
+            new_rows.append(position)
+            new_region_rows.setdefault(record['Region'].strip().lower(), []).append(position)
+
+        if new_rows:
+            self.all_rows = self._merge(self.all_rows, new_rows)
+            for region, rows in new_region_rows.items():
+                self.region_rows[region] = self._merge(self.region_rows.get(region, ([], [])), rows)
+
+        return self
+
+    def _merge(self, rows, new_positions):
+        # new positions are larger than every indexed one, so placing them after equal amounts keeps ties in file order
+        # the runs of existing rows between new ones are copied as slices
+        amounts, positions = rows
+        new_amounts, new_positions = self._sorted_by_amount(new_positions)
+
+        merged_amounts = []
+        merged_positions = []
+        start = 0
+        for amount, position in zip(new_amounts, new_positions):
+            at = bisect_right(amounts, amount, start)
+            merged_amounts += amounts[start:at]
+            merged_positions += positions[start:at]
+            merged_amounts.append(amount)
+            merged_positions.append(position)
+            start = at
+
+        merged_amounts += amounts[start:]
+        merged_positions += positions[start:]
+        return merged_amounts, merged_positions
+
+    def _sorted_by_amount(self, positions):
+        # ties keep file order, so the positions inside an amount range stay easy to re-sort
+        ordered = sorted(positions, key=lambda position: self.amounts[position])
+        return [self.amounts[position] for position in ordered], ordered
+
+    # available (normalized) regions and the amount range of the valid transactions
+    def regions(self):
+        return sorted(self.region_rows)
+
+    def amount_range(self):
+        amounts = self.all_rows[0]
+        return (amounts[0], amounts[-1]) if amounts else (None, None)
+
+    # returns the positions of the valid transactions in the region with min_amount <= amount <= max_amount
+    # and the number of rows in the region (before the amount filter)
+    def _query_positions(self, region=None, min_amount=None, max_amount=None):
+        if region:
+            amounts, positions = self.region_rows.get(region.strip().lower(), ([], []))
+        else:
+            amounts, positions = self.all_rows
+
+        low = bisect_left(amounts, float(min_amount)) if min_amount is not None else 0
+        high = bisect_right(amounts, float(max_amount)) if max_amount is not None else len(amounts)
+        return positions[low:max(low, high)], len(positions)
+
+    # returns the matching transactions, in their original order
+    def query(self, region=None, min_amount=None, max_amount=None):
+        positions, _ = self._query_positions(region, min_amount, max_amount)
+        return [self.transactions[position] for position in sorted(positions)]
+
+    # same result as validate_and_filter on the indexed transactions, without scanning them again
+    # returns (filtered transactions, invalid count, filter summary)
+    def validate_and_filter(self, region=None, min_amount=None, max_amount=None):
+        positions, region_count = self._query_positions(region, min_amount, max_amount)
+        filtered = [self.transactions[position] for position in sorted(positions)]
+
+        filter_summary = {
+            'total_input': self.total_input,
+            'invalid': self.invalid_count,
+            'duplicates': 0,
+            'filtered_by_region': len(self.transactions) - region_count,
+            'filtered_by_amount': region_count - len(filtered),
+            'final_count': len(filtered)
+        }
+
+        return (filtered, self.invalid_count, filter_summary)
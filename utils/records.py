@@ -0,0 +1,91 @@
+from collections.abc import Mapping
+
+from utils.money import paise_from_float
+
+# --------------- COMPACT TRANSACTION RECORDS ---------------
+
+TRANSACTION_FIELDS = ('TransactionID', 'Date', 'ProductID', 'ProductName', 'Quantity', 'UnitPrice', 'CustomerID', 'Region')
+API_FIELDS = ('API_Category', 'API_Brand', 'API_Rating', 'API_Match')
+
+
+# Read-only dictionary interface shared by the record types below
+# Mapping provides get, keys, items, values, 'in' and == (also against plain dictionaries)
+class _RecordMapping(Mapping):
+    __slots__ = ()
+    FIELDS = ()
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    # returns a plain dictionary copy that can be modified freely
+    def copy(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.copy()!r})"
+
+
+# A parsed transaction - fields are stored in __slots__ instead of a per-row dictionary
+# Supports the same record['Field'] access as the dictionaries it replaces
+# price_paise holds the exact UnitPrice in integer paise (not one of the fields) - aggregations sum it instead of
+# the float UnitPrice; it is derived from UnitPrice when the parser does not pass the exact value
+class Transaction(_RecordMapping):
+    __slots__ = TRANSACTION_FIELDS + ('price_paise',)
+    FIELDS = TRANSACTION_FIELDS
+
+    def __init__(self, TransactionID, Date, ProductID, ProductName, Quantity, UnitPrice, CustomerID, Region, price_paise=None):
+        self.TransactionID = TransactionID
+        self.Date = Date
+        self.ProductID = ProductID
+        self.ProductName = ProductName
+        self.Quantity = Quantity
+        self.UnitPrice = UnitPrice
+        self.CustomerID = CustomerID
+        self.Region = Region
+        self.price_paise = paise_from_float(UnitPrice) if price_paise is None else price_paise
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    # only the transaction fields can be set - there is no room for extra keys
+    def __setitem__(self, key, value):
+        if key not in TRANSACTION_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+        if key == 'UnitPrice':
+            self.price_paise = paise_from_float(value)
+
+    def __reduce__(self):
+        return (Transaction, tuple(getattr(self, field) for field in TRANSACTION_FIELDS) + (self.price_paise,))
+
+
+# A transaction enriched with API product information
+# The API fields are read from the shared product catalog entry, nothing from the transaction is copied
+class EnrichedTransaction(_RecordMapping):
+    __slots__ = ('record', 'api_info')
+    FIELDS = TRANSACTION_FIELDS + API_FIELDS
+
+    def __init__(self, record, api_info=None):
+        self.record = record
+        # product mapping entry, or None if the product was not found in the API
+        self.api_info = api_info
+
+    def __getitem__(self, key):
+        if key == 'API_Match':
+            return self.api_info is not None
+        if key == 'API_Category':
+            return self.api_info.get('category') if self.api_info is not None else None
+        if key == 'API_Brand':
+            return self.api_info.get('brand') if self.api_info is not None else None
+        if key == 'API_Rating':
+            return self.api_info.get('rating') if self.api_info is not None else None
+        return self.record[key]
+
+    def __reduce__(self):
+        return (EnrichedTransaction, (self.record, self.api_info))
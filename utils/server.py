@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from utils.file_handler import get_data_path, detect_encoding, iter_lines_from_handle, iter_transactions
+from utils.data_processor import (
+    SalesAggregates,
+    calculate_total_revenue,
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    top_customers,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products
+)
+from utils.api_handler import iter_enriched_sales_data
+from utils.query import TransactionIndex
+from utils.money import to_rupees, average_paise
+
+# the source file is checked for changes at most this often (seconds)
+RELOAD_INTERVAL = 1.0
+
+# number of filtered aggregates kept between reloads
+QUERY_CACHE_SIZE = 128
+
+# bytes before the loaded offset that are hashed to notice a file rewritten in place
+REWRITE_CHECK_BYTES = 64 * 1024
+
+
+# --------------- RESIDENT ANALYTICS STORE ---------------
+
+# Loads the sales file once and keeps the valid transactions indexed in memory:
+# a TransactionIndex for region / amount filters, SalesAggregates for the whole file and enrichment counts
+# Lines appended to the file are read, indexed and aggregated on the next refresh; a file that was replaced, shrank
+# or whose last REWRITE_CHECK_BYTES before the loaded offset changed is reloaded from scratch
+# If the file cannot be read (e.g. in the middle of a rotation) the last loaded snapshot keeps being served
+class AnalyticsStore:
+    def __init__(self, filename, product_mapping, reload_interval=RELOAD_INTERVAL):
+        self.filename = filename
+        self.data_path = get_data_path(filename)
+        self.product_mapping = product_mapping
+        self.reload_interval = reload_interval
+        # queries and reloads run on the server threads - the lock keeps them from interleaving
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.reloads = {'full': 0, 'incremental': 0}
+        # no snapshot until the file has been loaded once
+        self.index = None
+        self.stat = None
+        self.loaded_at = None
+        self.offset = 0
+        self.error = None
+        self.last_check = 0.0
+        self.refresh(force=True)
+
+    # reads the whole file into a fresh index
+    # the file is opened before the current snapshot is dropped, so a missing file leaves it in place
+    def load(self):
+        encoding = detect_encoding(self.data_path)
+        with open(self.data_path, 'rb') as f:
+            self.encoding = encoding
+            self.offset = 0
+            self.index = TransactionIndex([])
+            self.aggregates = SalesAggregates()
+            self.enrichment = {'total': 0, 'matched': 0}
+            self._read_appended(f)
+        self.reloads['full'] += 1
+
+    # reads, validates, indexes, aggregates and enriches the complete lines after the current offset of an open file
+    # returns the number of new valid transactions
+    def _read_appended(self, f):
+        position = {}
+        raw_lines = iter_lines_from_handle(f, self.offset, self.encoding, position)
+
+        first_new = len(self.index.transactions)
+        self.index.extend(iter_transactions(raw_lines))
+        new_transactions = self.index.transactions[first_new:]
+
+        self.aggregates.update(new_transactions)
+        for _ in iter_enriched_sales_data(new_transactions, self.product_mapping, self.enrichment):
+            pass
+
+        self.offset = position['offset']
+        self.window_digest = _window_digest(f, self.offset)
+        self.stat = os.fstat(f.fileno())
+        self.loaded_at = datetime.now()
+
+        # cached query results describe the previous data
+        self.generation += 1
+        self._query_cache = {}
+        return len(new_transactions)
+
+    # picks up changes to the source file - at most once per reload_interval
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_check < self.reload_interval:
+            return
+        self.last_check = now
+
+        try:
+            if self.index is None:
+                self.load()
+            else:
+                self._refresh_changed()
+            self.error = None
+        except OSError as err:
+            # e.g. the file is being rotated - queries keep using the last snapshot and the next refresh retries
+            self.error = str(err)
+
+    def _refresh_changed(self):
+        stat = os.stat(self.data_path)
+        if stat.st_size == self.stat.st_size and stat.st_mtime_ns == self.stat.st_mtime_ns and stat.st_ino == self.stat.st_ino:
+            return
+
+        # a different file, a shorter one or changed bytes just before the offset mean the file was rewritten
+        if (stat.st_ino, stat.st_dev) != (self.stat.st_ino, self.stat.st_dev) or stat.st_size < self.offset:
+            self.load()
+            return
+
+        with open(self.data_path, 'rb') as f:
+            if _window_digest(f, self.offset) == self.window_digest:
+                self._read_appended(f)
+                self.reloads['incremental'] += 1
+                return
+        self.load()
+
+    # aggregates of the valid transactions matching the filters - unfiltered queries use the resident aggregates,
+    # filtered ones are built from the index once and cached until the next reload
+    def aggregates_for(self, region=None, min_amount=None, max_amount=None):
+        if region is None and min_amount is None and max_amount is None:
+            return self.aggregates
+
+        key = (region.strip().lower() if region else None, min_amount, max_amount)
+        aggregates = self._query_cache.get(key)
+        if aggregates is None:
+            aggregates = SalesAggregates().update(self.index.query(region, min_amount, max_amount))
+            if len(self._query_cache) >= QUERY_CACHE_SIZE:
+                del self._query_cache[next(iter(self._query_cache))]
+            self._query_cache[key] = aggregates
+
+        return aggregates
+
+    def status(self):
+        return {
+            'source': str(self.data_path),
+            'loaded_at': self.loaded_at.isoformat(timespec='seconds') if self.loaded_at else None,
+            'error': self.error,
+            'generation': self.generation,
+            'reloads': self.reloads,
+            'valid_transactions': len(self.index.transactions) if self.index is not None else 0,
+            'invalid_transactions': self.index.invalid_count if self.index is not None else 0,
+            'offset': self.offset,
+        }
+
+
+# hash of the REWRITE_CHECK_BYTES of an open file that end at `offset`
+def _window_digest(f, offset):
+    start = max(0, offset - REWRITE_CHECK_BYTES)
+    f.seek(start)
+    return hashlib.blake2b(f.read(offset - start), digest_size=16).digest()
+
+
+# --------------- QUERY HANDLERS ---------------
+
+# every handler gets the store, the aggregates for the request's filters and the parsed query parameters
+# and returns JSON-compatible data
+
+def _summary(store, aggregates, params):
+    total_revenue = calculate_total_revenue(aggregates)
+    return {
+        'total_revenue': total_revenue,
+        'total_transactions': aggregates.record_count,
+        'average_order_value': to_rupees(average_paise(aggregates.total_revenue_paise, aggregates.record_count)),
+        'date_range': [aggregates.min_date, aggregates.max_date],
+    }
+
+
+def _regions(store, aggregates, params):
+    return region_wise_sales(aggregates)
+
+
+def _top_products(store, aggregates, params):
+    rows = top_selling_products(aggregates, n=_int_param(params, 'n', 5))
+    return [{'product': product, 'quantity': quantity, 'revenue': revenue} for product, quantity, revenue in rows]
+
+
+def _low_products(store, aggregates, params):
+    rows = low_performing_products(aggregates, threshold=_int_param(params, 'threshold', 10))
+    return [{'product': product, 'quantity': quantity, 'revenue': revenue} for product, quantity, revenue in rows]
+
+
+def _customers(store, aggregates, params):
+    if 'n' in params:
+        return top_customers(aggregates, n=_int_param(params, 'n', 5))
+    return customer_analysis(aggregates)
+
+
+def _daily(store, aggregates, params):
+    return daily_sales_trend(aggregates)
+
+
+def _peak(store, aggregates, params):
+    if not aggregates.dates:
+        return None
+    date, revenue, transaction_count = find_peak_sales_day(aggregates)
+    return {'date': date, 'revenue': revenue, 'transaction_count': transaction_count}
+
+
+def _enrichment(store, aggregates, params):
+    return store.enrichment
+
+
+def _status(store, aggregates, params):
+    return store.status()
+
+
+QUERY_HANDLERS = {
+    '/summary': _summary,
+    '/regions': _regions,
+    '/products/top': _top_products,
+    '/products/low': _low_products,
+    '/customers': _customers,
+    '/daily': _daily,
+    '/peak': _peak,
+    '/enrichment': _enrichment,
+    '/status': _status,
+}
+
+
+def _int_param(params, name, default):
+    value = params.get(name)
+    return int(value) if value is not None else default
+
+
+def _float_param(params, name):
+    value = params.get(name)
+    return float(value) if value not in (None, '') else None
+
+
+# --------------- HTTP SERVER ---------------
+
+# GET /<query>?region=&min_amount=&max_amount=&n=&threshold= - responses are JSON
+# GET /reload checks the source file for changes immediately
+class AnalyticsRequestHandler(BaseHTTPRequestHandler):
+    store = None
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        path = url.path.rstrip('/') or '/'
+
+        handler = QUERY_HANDLERS.get(path)
+        if handler is None and path != '/reload':
+            return self._send(404, {'error': f"unknown query {path}", 'queries': sorted(QUERY_HANDLERS) + ['/reload']}, started)
+
+        try:
+            with self.store.lock:
+                if path == '/reload':
+                    self.store.refresh(force=True)
+                    return self._send(200 if self.store.index is not None else 503, self.store.status(), started)
+
+                self.store.refresh()
+                if self.store.index is None:
+                    return self._send(503, {'error': f"sales data not loaded: {self.store.error}"}, started)
+                aggregates = self.store.aggregates_for(
+                    params.get('region') or None,
+                    _float_param(params, 'min_amount'),
+                    _float_param(params, 'max_amount')
+                )
+                result = handler(self.store, aggregates, params)
+        except ValueError as err:
+            return self._send(400, {'error': str(err)}, started)
+
+        self._send(200, result, started)
+
+    def _send(self, status, payload, started):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Query-Time-Ms', f"{(time.perf_counter() - started) * 1000:.3f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    # dashboards poll often - requests are not logged
+    def log_message(self, format, *args):
+        pass
+
+
+# function to serve the store until interrupted
+def serve(store, host='127.0.0.1', port=8765):
+    handler = type('BoundAnalyticsRequestHandler', (AnalyticsRequestHandler,), {'store': store})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"✓ Serving analytics on http://{host}:{server.server_port} (Ctrl+C to stop)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,85 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from utils.file_handler import get_data_path, detect_encoding, new_filter_summary
+from utils.data_processor import SalesAggregates
+from utils.parallel import MIN_PARALLEL_BYTES, find_chunk_ranges, _process_chunk
+
+
+# --------------- SHARDED INPUT (MAP-REDUCE) ---------------
+
+# Sales often arrive as many per-store or per-day files with the same header and format
+# Map: every shard (or line-aligned piece of a large shard) is parsed, validated, aggregated and enriched in a worker process
+# Reduce: the partial filter summaries, SalesAggregates and enrichment counts are merged in shard order,
+# so the result is the same as processing the shards concatenated into one file
+
+
+# function to list the shard files for a directory or glob pattern (relative paths start in the data folder)
+# hidden files (checkpoints, caches) are skipped, files are returned in name order
+def find_shard_files(pattern):
+    path = get_data_path(pattern)
+
+    if path.is_dir():
+        candidates = path.iterdir()
+    else:
+        candidates = (Path(match) for match in glob.glob(str(path)))
+
+    return sorted(candidate for candidate in candidates if candidate.is_file() and not candidate.name.startswith('.'))
+
+
+# function to build the worker tasks - a shard larger than MIN_PARALLEL_BYTES is split into pieces of about that size
+# (at most `workers` pieces), so one very large shard does not keep a single core busy while the others sit idle
+def build_shard_tasks(shard_files, workers, region=None, min_amount=None, max_amount=None, product_mapping=None, distinct_precision=None):
+    tasks = []
+
+    for shard_path in shard_files:
+        size = os.path.getsize(shard_path)
+        chunk_count = min(workers, max(1, size // MIN_PARALLEL_BYTES))
+        encoding = detect_encoding(shard_path)
+
+        for start, end in find_chunk_ranges(shard_path, chunk_count):
+            tasks.append((str(shard_path), start, end, encoding, region, min_amount, max_amount,
+                          False, product_mapping, distinct_precision))
+
+    return tasks
+
+
+# function to process every shard matched by a directory or glob pattern on several cores
+# returns (filter_summary, merged aggregates, enrichment counts, shard files) - the aggregates and enrichment counts
+# can be passed straight to generate_sales_report
+def shard_ingest(pattern, workers=None, region=None, min_amount=None, max_amount=None, product_mapping=None, distinct_precision=None):
+    shard_files = find_shard_files(pattern)
+    filter_summary = new_filter_summary()
+    aggregates = SalesAggregates(distinct_precision)
+    enrichment = {'total': 0, 'matched': 0}
+
+    if not shard_files:
+        print(f"Error: No sales files match {pattern}.")
+        return filter_summary, aggregates, enrichment, shard_files
+
+    workers = workers or os.cpu_count() or 1
+    tasks = build_shard_tasks(shard_files, workers, region, min_amount, max_amount, product_mapping, distinct_precision)
+
+    # ------ MAP ------
+
+    if workers == 1 or len(tasks) == 1:
+        results = [_process_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            # small shards are handed out in batches to keep the per-task overhead low; map keeps the shard order
+            results = pool.map(_process_chunk, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+            results = list(results)
+
+    # ------ REDUCE ------
+
+    for chunk_summary, chunk_aggregates, _, chunk_enrichment in results:
+        for key, count in chunk_summary.items():
+            filter_summary[key] += count
+        aggregates.merge(chunk_aggregates)
+        if chunk_enrichment is not None:
+            enrichment['total'] += chunk_enrichment['total']
+            enrichment['matched'] += chunk_enrichment['matched']
+
+    return filter_summary, aggregates, enrichment, shard_files
@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import heapq
+import math
+
+
+# --------------- SPACE-SAVING HEAVY HITTERS ---------------
+
+# Approximate top-k counter with a fixed memory budget (Metwally et al., weighted Space-Saving)
+# At most `capacity` keys are monitored. When a new key arrives and the table is full, the key with the
+# smallest count is replaced and the new key inherits that count as its error
+# Guarantees for every monitored key: true count <= estimate <= true count + error, and error <= total / capacity
+# Any key whose true count is above total / capacity is always monitored
+class SpaceSaving:
+    def __init__(self, capacity=1000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.capacity = capacity
+        self.total = 0
+        # key -> [estimated count, error, extra sum]
+        # the extra sum accumulates a second value (e.g. revenue) while the key is monitored
+        self.counters = {}
+        # min-heap of (count, key) - entries whose count no longer matches the counter are skipped lazily
+        self._heap = []
+
+    # adds weight to a key (extra is summed alongside, e.g. revenue when counting quantity)
+    def update(self, key, weight=1, extra=0):
+        self.total += weight
+        counter = self.counters.get(key)
+
+        if counter is not None:
+            counter[0] += weight
+            counter[2] += extra
+        elif len(self.counters) < self.capacity:
+            counter = self.counters[key] = [weight, 0, extra]
+        else:
+            min_count, min_key = self._pop_min()
+            del self.counters[min_key]
+            counter = self.counters[key] = [min_count + weight, min_count, extra]
+
+        heapq.heappush(self._heap, (counter[0], key))
+
+        # stale heap entries are dropped once they outnumber the live counters
+        if len(self._heap) > 4 * self.capacity + 64:
+            self._heap = [(counter[0], key) for key, counter in self.counters.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, key = heapq.heappop(self._heap)
+            counter = self.counters.get(key)
+            if counter is not None and counter[0] == count:
+                return count, key
+
+    # largest possible overestimate of any monitored count
+    def max_error(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+
+    # returns the n keys with the largest estimated counts: (key, estimate, error, extra sum), largest first
+    def top(self, n):
+        items = heapq.nlargest(n, self.counters.items(), key=lambda item: item[1][0])
+        return [(key, count, error, extra) for key, (count, error, extra) in items]
+
+    # merges another sketch into this one (keeps the `capacity` largest combined counters)
+    def merge(self, other):
+        own_floor = self.max_error()
+        other_floor = other.max_error()
+        combined = {}
+
+        # a key missing from one sketch may have had up to that sketch's minimum count there
+        for key, (count, error, extra) in self.counters.items():
+            other_counter = other.counters.get(key)
+            if other_counter is None:
+                combined[key] = [count + other_floor, error + other_floor, extra]
+            else:
+                combined[key] = [count + other_counter[0], error + other_counter[1], extra + other_counter[2]]
+
+        for key, (count, error, extra) in other.counters.items():
+            if key not in combined:
+                combined[key] = [count + own_floor, error + own_floor, extra]
+
+        kept = heapq.nlargest(self.capacity, combined.items(), key=lambda item: item[1][0])
+        self.counters = dict(kept)
+        self.total += other.total
+        self._heap = [(counter[0], key) for key, counter in self.counters.items()]
+        heapq.heapify(self._heap)
+        return self
+
+
+# --------------- HYPERLOGLOG DISTINCT COUNTS ---------------
+
+# Approximate distinct counter (Flajolet et al.) using 2**precision one-byte registers
+# Standard error is about 1.04 / sqrt(2**precision): ~1.6% at precision 12 (4 KB), ~0.4% at precision 16 (64 KB)
+# Supports the parts of the set interface used by the aggregations: add(), update() with another sketch, len()
+class HyperLogLog:
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    # adds a value - its 64-bit hash picks a register (first `precision` bits) and a rank (leading zeros + 1 of the rest)
+    def add(self, value):
+        hashed = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    # merges another sketch of the same precision - the result counts the union of both inputs
+    def update(self, other):
+        if other.precision != self.precision:
+            raise ValueError("cannot merge HyperLogLog sketches with different precision")
+
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def copy(self):
+        sketch = HyperLogLog(self.precision)
+        sketch.registers = bytearray(self.registers)
+        return sketch
+
+    # estimated number of distinct values
+    def count(self):
+        register_count = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / register_count)
+        estimate = alpha * register_count * register_count / sum(2.0 ** -rank for rank in self.registers)
+
+        # small range correction - linear counting while some registers are still empty
+        empty = self.registers.count(0)
+        if estimate <= 2.5 * register_count and empty:
+            estimate = register_count * math.log(register_count / empty)
+
+        return estimate
+
+    def __len__(self):
+        return int(round(self.count()))
+
+    # compact serialization (used when aggregates are saved to a checkpoint)
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['precision'])
+        sketch.registers = bytearray(base64.b64decode(data['registers']))
+        return sketch
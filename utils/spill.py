@@ -0,0 +1,108 @@
+import heapq
+import os
+import pickle
+
+# number of hash partitions the spilled groups are split into - partitions are merged one at a time,
+# so merging holds about 1/SPILL_PARTITIONS of the spilled groups in memory
+SPILL_PARTITIONS = 64
+
+# groups per pickled batch in the spill files - reading streams one batch per partition at a time,
+# so about SPILL_PARTITIONS * batch_size groups are in memory while the partitions are merged back
+SPILL_BATCH_SIZE = 1_000
+
+
+# --------------- SPILL-TO-DISK GROUP TABLE ---------------
+
+# Partial aggregates of one group-by (e.g. customer -> stats) that did not fit in memory
+# Every spill appends the in-memory table as a run: groups are hash-partitioned by key into one file per partition
+# and tagged with (run, position), the order in which the run first saw them
+# Reading merges each partition on its own - the partial stats of a key are combined and its earliest tag kept -
+# rewrites the partition as one run sorted by tag, then streams all partitions back in tag order
+# That is the order in which the keys were first seen, the same order as the in-memory dictionary,
+# so results sorted or ranked with ties come out exactly as on the in-memory path
+class SpilledGroups:
+    def __init__(self, name, combine, spill_dir, partitions=SPILL_PARTITIONS, batch_size=SPILL_BATCH_SIZE):
+        self.name = name
+        # function(stats, other_stats) that adds other_stats into stats
+        self.combine = combine
+        self.batch_size = batch_size
+        self.paths = [os.path.join(spill_dir, f"{name}_{partition}.pkl") for partition in range(partitions)]
+        self.runs = 0
+        self.compacted = True
+
+    # writes a dictionary of key -> stats as a new run and empties it
+    def spill(self, groups):
+        partition_count = len(self.paths)
+        buffers = [[] for _ in self.paths]
+        run = self.runs
+
+        # str hashes differ between processes but not within one, which is all the partitioning needs
+        for position, (key, stats) in enumerate(groups.items()):
+            buffers[hash(key) % partition_count].append((run, position, key, stats))
+
+        for path, buffer in zip(self.paths, buffers):
+            if buffer:
+                with open(path, 'ab') as f:
+                    _write_batches(f, buffer, self.batch_size)
+
+        groups.clear()
+        self.runs += 1
+        self.compacted = False
+
+    # merges the runs of each partition into one run sorted by first-seen tag
+    def _compact(self):
+        for path in self.paths:
+            merged = {}
+            for batch in _read_batches(path):
+                for run, position, key, stats in batch:
+                    entry = merged.get(key)
+                    if entry is None:
+                        merged[key] = [(run, position), stats]
+                    else:
+                        entry[0] = min(entry[0], (run, position))
+                        self.combine(entry[1], stats)
+
+            if not merged:
+                continue
+
+            items = sorted(((run, position, key, stats) for key, ((run, position), stats) in merged.items()),
+                           key=lambda item: (item[0], item[1]))
+            temp_path = path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                _write_batches(f, items, self.batch_size)
+            os.replace(temp_path, path)
+
+        self.compacted = True
+
+    # yields (key, stats) for every spilled key, combined over all runs, in the order the keys were first seen
+    def items(self):
+        if not self.compacted:
+            self._compact()
+
+        partitions = [_iter_groups(path) for path in self.paths]
+        for _, _, key, stats in heapq.merge(*partitions, key=lambda item: (item[0], item[1])):
+            yield key, stats
+
+
+def _write_batches(f, items, batch_size):
+    for start in range(0, len(items), batch_size):
+        pickle.dump(items[start:start + batch_size], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_batches(path):
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+
+    with f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _iter_groups(path):
+    for batch in _read_batches(path):
+        yield from batch
@@ -0,0 +1,97 @@
+import os
+
+from utils.file_handler import (
+    get_data_path,
+    detect_encoding,
+    iter_lines_from_handle,
+    iter_transactions,
+    iter_valid_transactions,
+    new_filter_summary
+)
+from utils.data_processor import SalesAggregates, aggregate_stream
+from utils.api_handler import iter_enriched_sales_data
+
+
+# --------------- LIVE TAIL ---------------
+
+# Follows a sales data file as it grows and keeps the running aggregates, filter summary and enrichment counts current
+# Only complete lines after the last offset are parsed on each poll, so the cost of a poll depends on the new data only
+# - rotation (the path now points to a different file): the rest of the old file is read, then the new file
+#   is followed from its start and its rows are added to the same totals
+# - truncation (same file, now shorter than the offset): the file was rewritten, so the totals are rebuilt from it
+class SalesFileTailer:
+    def __init__(self, filename, product_mapping, region=None, min_amount=None, max_amount=None):
+        self.filename = filename
+        self.data_path = get_data_path(filename)
+        self.product_mapping = product_mapping
+        self.filters = (region, min_amount, max_amount)
+        self.file = None
+        self.file_id = None
+        self.offset = 0
+        self.encoding = None
+        self.rotations = 0
+        self.truncations = 0
+        self.reset()
+
+    # starts the totals from zero
+    def reset(self):
+        self.aggregates = SalesAggregates()
+        self.filter_summary = new_filter_summary()
+        self.enrichment = {'total': 0, 'matched': 0}
+
+    def _open(self):
+        self.file = open(self.data_path, 'rb')
+        stat = os.fstat(self.file.fileno())
+        self.file_id = (stat.st_dev, stat.st_ino)
+        self.offset = 0
+        # the encoding is detected from what the file holds when it is opened; later bad lines fall back per line
+        self.encoding = detect_encoding(self.data_path)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    # reads the complete lines appended since the last poll - returns the number of new valid transactions
+    def poll(self):
+        new_rows = 0
+
+        if self.file is None:
+            if not self.data_path.exists():
+                return 0
+            self._open()
+
+        try:
+            stat = os.stat(self.data_path)
+        except FileNotFoundError:
+            stat = None
+
+        if stat is not None and (stat.st_dev, stat.st_ino) == self.file_id and stat.st_size < self.offset:
+            # truncated in place - the file was rewritten from the start
+            self.truncations += 1
+            self.reset()
+            self.offset = 0
+
+        new_rows += self._read_appended()
+
+        if stat is not None and (stat.st_dev, stat.st_ino) != self.file_id:
+            # rotated - the old file has been read to its end above, the new one is followed from its start
+            self.rotations += 1
+            self.close()
+            self._open()
+            new_rows += self._read_appended()
+
+        return new_rows
+
+    def _read_appended(self):
+        position = {}
+        raw_lines = iter_lines_from_handle(self.file, self.offset, self.encoding, position)
+        valid_txns = iter_valid_transactions(iter_transactions(raw_lines), *self.filters, self.filter_summary)
+        aggregated_txns = aggregate_stream(valid_txns, self.aggregates)
+
+        new_rows = 0
+        for _ in iter_enriched_sales_data(aggregated_txns, self.product_mapping, self.enrichment):
+            new_rows += 1
+
+        self.offset = position['offset']
+        return new_rows
@@ -0,0 +1,99 @@
+from datetime import date as calendar_date, timedelta
+from itertools import accumulate
+
+from utils.data_processor import SalesAggregates, aggregate_transactions, period_key
+from utils.money import to_rupees
+
+
+# --------------- PREFIX-SUM TIME INDEX ---------------
+
+# Daily revenue and transaction counts laid out by date ordinal, with cumulative (prefix-sum) arrays
+# Built once from the per-date aggregates - days without sales inside the range count as zero
+# Any date-range total is then two array lookups, and rolling windows / rollups take one step per day
+# Revenue is accumulated in integer paise, so a range total is exact however long the prefix before it
+class TimeIndex:
+    def __init__(self, transactions):
+        aggregates = transactions if isinstance(transactions, SalesAggregates) else aggregate_transactions(transactions)
+
+        self.start_ordinal = None
+        self.day_count = 0
+        # cumulative_*[i] is the total of the first i days, so cumulative_*[0] is 0 (revenue in paise)
+        self.cumulative_revenue = [0]
+        self.cumulative_count = [0]
+
+        if not aggregates.dates:
+            return
+
+        self.start_ordinal = calendar_date.fromisoformat(aggregates.min_date).toordinal()
+        self.day_count = calendar_date.fromisoformat(aggregates.max_date).toordinal() - self.start_ordinal + 1
+
+        daily_revenue = [0] * self.day_count
+        daily_count = [0] * self.day_count
+        for date, (revenue, count, _) in aggregates.dates.items():
+            position = calendar_date.fromisoformat(date).toordinal() - self.start_ordinal
+            daily_revenue[position] = revenue
+            daily_count[position] = count
+
+        self.cumulative_revenue = list(accumulate(daily_revenue, initial=0))
+        self.cumulative_count = list(accumulate(daily_count, initial=0))
+
+    # ISO date of the day at a position in the index
+    def date_at(self, position):
+        return calendar_date.fromordinal(self.start_ordinal + position).isoformat()
+
+    # position of a date in the index, clamped to [0, day_count]
+    def _position(self, date):
+        position = calendar_date.fromisoformat(date).toordinal() - self.start_ordinal
+        return min(max(position, 0), self.day_count)
+
+    # totals for positions [start, end) - revenue in rupees
+    def _totals(self, start, end):
+        return (to_rupees(self.cumulative_revenue[end] - self.cumulative_revenue[start]),
+                self.cumulative_count[end] - self.cumulative_count[start])
+
+    # returns (revenue, transaction count) between two dates, both inclusive - None leaves that side open
+    def range_totals(self, start_date=None, end_date=None):
+        if self.day_count == 0:
+            return (0.0, 0)
+
+        start = self._position(start_date) if start_date else 0
+        end = self._position((calendar_date.fromisoformat(end_date) + timedelta(days=1)).isoformat()) if end_date else self.day_count
+        return self._totals(start, max(start, end))
+
+    # returns a dictionary of date -> {'revenue', 'transaction_count'} for the `window` days ending on each date
+    # (windows at the start of the range only cover the days that exist)
+    def rolling(self, window=7):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+
+        rolling_stats = {}
+        for end in range(1, self.day_count + 1):
+            revenue, count = self._totals(max(0, end - window), end)
+            rolling_stats[self.date_at(end - 1)] = {'revenue': revenue, 'transaction_count': count}
+
+        return rolling_stats
+
+    # returns a dictionary of week (ISO year and week, e.g. 2024-W05) or month (e.g. 2024-01) ->
+    # {'revenue', 'transaction_count', 'start_date', 'end_date'}, in chronological order
+    # start_date / end_date are the first and last days of the period that fall inside the data's date range
+    def rollup(self, period='week'):
+        periods = {}
+        for position in range(self.day_count):
+            date = self.date_at(position)
+            key = period_key(date, period)
+            if key not in periods:
+                periods[key] = [position, position]
+            else:
+                periods[key][1] = position
+
+        rollup_stats = {}
+        for key, (first, last) in periods.items():
+            revenue, count = self._totals(first, last + 1)
+            rollup_stats[key] = {
+                'revenue': revenue,
+                'transaction_count': count,
+                'start_date': self.date_at(first),
+                'end_date': self.date_at(last),
+            }
+
+        return rollup_stats